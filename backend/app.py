@@ -38,34 +38,151 @@ def create_app():
     from routes.eventos import eventos_bp
     from routes.asistencias import asistencias_bp
     from routes.auth import auth_bp
+    from routes.temporadas import temporadas_bp
+    from routes.debug import debug_bp
 
     app.register_blueprint(usuarios_bp, url_prefix='/api/usuarios')
     app.register_blueprint(eventos_bp, url_prefix='/api/eventos')
     app.register_blueprint(asistencias_bp, url_prefix='/api/asistencias')
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(temporadas_bp, url_prefix='/api/temporadas')
+    app.register_blueprint(debug_bp, url_prefix='/api/debug')
+
+    # Exportes XLSX/PDF del reporte (invalidación por versión de datos)
+    import exportes
+    exportes.init_app(app)
+
+    # Perfilado opcional por petición (cabecera X-Profile o PROFILE_SAMPLE_RATE)
+    import profiling
+    profiling.init_app(app)
+
+    # Comandos `flask datos ...` (carga masiva, tipos de asistencia, mantenimiento)
+    from cli import datos_cli
+    app.cli.add_command(datos_cli)
+
+    # Health check para el balanceador/orquestador: no toca la base de datos
+    @app.route('/api/health')
+    def health():
+        return {"status": "ok"}, 200
 
     # Crear tablas si no existen y actualizar esquema
     with app.app_context():
         import models
         db.create_all()
+
+        # Asegurar que exista la agrupación por defecto (id 1) para los datos existentes
+        if models.Agrupacion.query.first() is None:
+            try:
+                db.session.add(models.Agrupacion(nombre='Principal'))
+                db.session.commit()
+            except Exception:
+                # Otro proceso pudo haberla creado al mismo tiempo
+                db.session.rollback()
         
         # Auto-migración: Asegurar que existan las nuevas columnas
         # Esto se ejecuta cada vez que inicia la app para "reparar" la BD automáticamente
-        from sqlalchemy import text
+        from sqlalchemy import text, inspect
         try:
             with db.engine.connect() as conn:
-                # Intentamos agregar las columnas. Si ya existen, Postgres con IF NOT EXISTS no falla.
-                conn.execute(text("ALTER TABLE usuario ADD COLUMN IF NOT EXISTS email VARCHAR(120);"))
-                conn.execute(text("ALTER TABLE usuario ADD COLUMN IF NOT EXISTS telefono VARCHAR(30);"))
-                conn.execute(text("ALTER TABLE usuario ADD COLUMN IF NOT EXISTS instrumento VARCHAR(100);"))
+                # Se consulta el esquema en vez de usar ADD COLUMN IF NOT EXISTS,
+                # que SQLite no soporta
+                columnas = {tabla: {c['name'] for c in inspect(conn).get_columns(tabla)}
+                            for tabla in ('usuario', 'evento', 'asistencia', 'admin')}
+                nuevas = [
+                    ('usuario', 'email', 'VARCHAR(120)'),
+                    ('usuario', 'telefono', 'VARCHAR(30)'),
+                    ('usuario', 'instrumento', 'VARCHAR(100)'),
+                ]
+                # Multi-agrupación: los registros existentes pasan a la agrupación por defecto
+                nuevas += [(tabla, 'id_agrupacion',
+                            'INTEGER NOT NULL DEFAULT 1 REFERENCES agrupacion(id_agrupacion)')
+                           for tabla in ('usuario', 'evento', 'asistencia', 'admin')]
+                for tabla, columna, tipo in nuevas:
+                    if columna not in columnas[tabla]:
+                        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo};"))
+
+                # El nombre de usuario pasa a ser único por agrupación
+                if conn.dialect.name == 'sqlite':
+                    _migrar_tablas_sqlite(conn)
+                else:
+                    conn.execute(text("ALTER TABLE usuario DROP CONSTRAINT IF EXISTS usuario_nombre_key;"))
+                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_usuario_agrupacion_nombre ON usuario (id_agrupacion, nombre);"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_asistencia_agrupacion_evento ON asistencia (id_agrupacion, id_evento);"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_asistencia_agrupacion_usuario ON asistencia (id_agrupacion, id_usuario);"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_admin_id_agrupacion ON admin (id_agrupacion);"))
                 conn.commit()
             print("✓ Esquema de base de datos actualizado correctamente.")
         except Exception as e:
-            # Si falla (ej. base de datos no soporta IF NOT EXISTS o error de conexión), lo logueamos pero no detenemos la app
+            # Si falla (ej. error de conexión), lo logueamos pero no detenemos la app
             print(f"⚠ Advertencia al actualizar esquema: {e}")
 
+        # Índice único de fecha por agrupación. Antes se unifican los eventos
+        # duplicados que pudiera tener la base, si no el índice no se puede crear.
+        from routes.eventos import unificar_eventos_duplicados
+        import exportes
+        try:
+            with db.engine.connect() as conn:
+                unificadas = unificar_eventos_duplicados(conn)
+                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_evento_agrupacion_fecha ON evento (id_agrupacion, fecha);"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_evento_agrupacion_fecha;"))
+                conn.commit()
+            for id_agrupacion in unificadas:
+                print(f"✓ Eventos duplicados unificados en la agrupación {id_agrupacion}.")
+                exportes.incrementar_version(id_agrupacion)
+        except Exception as e:
+            print(f"⚠ No se pudo crear el índice único de eventos: {e}")
+
     return app
 
+
+def _migrar_tablas_sqlite(conn):
+    """Cambios de esquema que SQLite no permite con ALTER TABLE."""
+    from sqlalchemy import text
+    import models
+
+    # El nombre de usuario pasa a ser único por agrupación: hay que quitar el
+    # UNIQUE(nombre) original, que no aparece en el inspector; se busca su índice automático
+    unico_nombre = False
+    for indice in conn.exec_driver_sql("PRAGMA index_list(usuario)").mappings():
+        if indice['origin'] == 'u' and indice['unique']:
+            cols = [c['name'] for c in conn.exec_driver_sql(f"PRAGMA index_info({indice['name']})").mappings()]
+            unico_nombre = unico_nombre or cols == ['nombre']
+    if unico_nombre:
+        _reconstruir_tabla_sqlite(conn, models.Usuario)
+
+    # Los ids de evento no deben reutilizarse: los archivados vuelven con el
+    # mismo id al restaurar la temporada
+    sql_evento = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'evento'")).scalar()
+    if 'AUTOINCREMENT' not in sql_evento.upper():
+        _reconstruir_tabla_sqlite(conn, models.Evento)
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'evento'"))
+        conn.execute(text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'evento', COALESCE(MAX(id_evento), 0) "
+            "FROM (SELECT id_evento FROM evento UNION ALL SELECT id_evento FROM evento_archivo)"
+        ))
+
+
+def _reconstruir_tabla_sqlite(conn, modelo):
+    """Recrea la tabla del modelo con su esquema actual conservando las filas.
+
+    Los índices no se copian: los crea después la auto-migración con
+    CREATE INDEX IF NOT EXISTS.
+    """
+    from sqlalchemy import text, MetaData
+    from sqlalchemy.schema import CreateTable
+    import models
+
+    tabla = modelo.__table__
+    columnas = ', '.join(c.name for c in tabla.columns)
+    metadata = MetaData()
+    models.Agrupacion.__table__.to_metadata(metadata)
+    nueva = tabla.to_metadata(metadata, name=f'{tabla.name}_nuevo')
+    conn.execute(CreateTable(nueva))
+    conn.execute(text(f"INSERT INTO {nueva.name} ({columnas}) SELECT {columnas} FROM {tabla.name}"))
+    conn.execute(text(f"DROP TABLE {tabla.name}"))
+    conn.execute(text(f"ALTER TABLE {nueva.name} RENAME TO {tabla.name}"))
+
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True)
\ No newline at end of file
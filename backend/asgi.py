@@ -0,0 +1,141 @@
+# asgi.py
+"""Servidor ASGI con las lecturas de alto tráfico en modo asíncrono.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Los GET de usuarios, eventos, asistencias, reporte-por-fecha y tipos se
+atienden con el motor asíncrono de SQLAlchemy, de modo que la espera de la
+base de datos no bloquea un worker. Todo lo demás (escrituras, importaciones,
+auth, etc.) se delega a la app Flask de siempre.
+"""
+import os
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from app import create_app
+import lecturas
+from reportes import consultas_reporte, armar_reporte
+from tenancy import get_agrupacion_id
+
+flask_app = create_app()
+
+
+def _url_asincrona(url):
+    """Traduce la URL de la base de datos al driver asíncrono equivalente."""
+    url = make_url(url)
+    if url.get_backend_name() == 'postgresql':
+        query = dict(url.query)
+        # asyncpg no entiende los parámetros de libpq
+        sslmode = query.pop('sslmode', None)
+        query.pop('channel_binding', None)
+        connect_args = {'ssl': True} if sslmode in ('require', 'verify-ca', 'verify-full') else {}
+        return url.set(drivername='postgresql+asyncpg', query=query), connect_args
+    if url.get_backend_name() == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite'), {}
+    return url, {}
+
+
+_url, _connect_args = _url_asincrona(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+engine = create_async_engine(
+    _url,
+    connect_args=_connect_args,
+    pool_size=int(os.getenv('ASYNC_POOL_SIZE', '10')),
+    max_overflow=int(os.getenv('ASYNC_MAX_OVERFLOW', '20')),
+    pool_pre_ping=True,
+)
+
+
+def _agrupacion(request):
+    """Devuelve (id_agrupacion, None) o (None, respuesta de error).
+
+    Corre tenancy.get_agrupacion_id en un contexto de petición de Flask con las
+    mismas cabeceras, así que flask-jwt-extended valida el token con la misma
+    configuración (leeway, tipo de token, cabecera) y los errores salen de los
+    mismos manejadores que en la app Flask.
+    """
+    with flask_app.test_request_context(request.url.path, headers=list(request.headers.items())):
+        try:
+            return get_agrupacion_id(), None
+        except Exception as e:
+            respuesta = flask_app.make_response(flask_app.handle_user_exception(e))
+            return None, Response(respuesta.get_data(), status_code=respuesta.status_code,
+                                  media_type=respuesta.mimetype)
+
+
+async def _filas(stmt):
+    async with engine.connect() as conn:
+        return (await conn.execute(stmt)).all()
+
+
+def _lectura(funcion):
+    async def endpoint(request):
+        id_agrupacion, error = _agrupacion(request)
+        if error is not None:
+            return error
+        return JSONResponse(await funcion(id_agrupacion))
+    return endpoint
+
+
+@_lectura
+async def get_usuarios(id_agrupacion):
+    return lecturas.serializar_usuarios(await _filas(lecturas.consulta_usuarios(id_agrupacion)))
+
+
+@_lectura
+async def get_eventos(id_agrupacion):
+    return lecturas.serializar_eventos(await _filas(lecturas.consulta_eventos(id_agrupacion)))
+
+
+@_lectura
+async def get_asistencias(id_agrupacion):
+    return lecturas.serializar_asistencias(await _filas(lecturas.consulta_asistencias(id_agrupacion)))
+
+
+@_lectura
+async def reporte_por_fecha(id_agrupacion):
+    usuarios, asistencias = consultas_reporte(id_agrupacion)
+    async with engine.connect() as conn:
+        filas_usuarios = (await conn.execute(usuarios)).all()
+        filas_asistencias = (await conn.execute(asistencias)).all()
+    return armar_reporte(filas_usuarios, filas_asistencias)
+
+
+# Los tipos son globales: igual que en Flask, no hace falta token
+async def get_tipos_asistencia(request):
+    return JSONResponse(lecturas.serializar_tipos(await _filas(lecturas.consulta_tipos())))
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+# Las rutas solo aceptan GET: cualquier otro método cae en el Mount de Flask
+app = Starlette(
+    routes=[
+        Route('/api/health', health, methods=['GET']),
+        Route('/api/usuarios', get_usuarios, methods=['GET']),
+        Route('/api/eventos', get_eventos, methods=['GET']),
+        Route('/api/asistencias', get_asistencias, methods=['GET']),
+        Route('/api/asistencias/reporte-por-fecha', reporte_por_fecha, methods=['GET']),
+        Route('/api/asistencias/tipos', get_tipos_asistencia, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,308 @@
+"""
+Verifica el presupuesto de consultas SQL de cada endpoint.
+
+Ejecuta cada ruta de los blueprints contra dos conjuntos de datos de distinto
+tamaño (en una base SQLite en memoria) y cuenta las sentencias emitidas.
+Falla si un endpoint supera su presupuesto declarado o si la cantidad de
+sentencias crece con el tamaño de los datos (típico de un N+1).
+
+Uso:  python check_consultas.py
+"""
+
+import atexit
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+
+# Base de datos en memoria, independiente de la configurada en .env
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from flask import current_app
+from sqlalchemy import event, insert
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from extensions import db, bcrypt
+import exportes
+from importacion import ReporteValidacion
+from profiling import listar_perfiles
+from models import Agrupacion, Usuario, Evento, Asistencia, TipoAsistencia, Admin, Temporada, VersionDatos
+
+TAMANIOS = {
+    'chico': (5, 4),      # (usuarios, eventos)
+    'grande': (60, 30),
+}
+
+# Presupuesto máximo de sentencias por (endpoint, método)
+PRESUPUESTOS = {
+    ('usuarios.get_usuarios', 'GET'): 1,
+    ('usuarios.create_usuario', 'POST'): 4,
+    ('usuarios.update_usuario', 'PUT'): 5,
+    ('usuarios.delete_usuario', 'DELETE'): 5,
+    ('usuarios.import_usuarios', 'POST'): 3,
+    ('usuarios.download_rechazos_usuarios', 'GET'): 0,
+    ('eventos.get_eventos', 'GET'): 1,
+    ('eventos.create_evento', 'POST'): 3,
+    ('eventos.update_evento', 'PUT'): 5,
+    ('eventos.delete_evento', 'DELETE'): 3,
+    ('asistencias.get_asistencias', 'GET'): 1,
+    ('asistencias.create_asistencia', 'POST'): 6,
+    ('asistencias.update_asistencia', 'PUT'): 4,
+    ('asistencias.aplicar_mutaciones', 'POST'): 11,
+    ('asistencias.delete_asistencia', 'DELETE'): 3,
+    ('asistencias.reporte_por_fecha', 'GET'): 2,
+    ('asistencias.exportar_reporte', 'GET'): 1,
+    ('asistencias.exportar_historial', 'GET'): 3,
+    ('asistencias.delete_all_asistencias', 'DELETE'): 2,
+    ('asistencias.delete_asistencias_by_user', 'DELETE'): 2,
+    ('asistencias.get_tipos_asistencia', 'GET'): 1,
+    ('asistencias.import_asistencias', 'POST'): 7,
+    ('asistencias.download_rechazos_asistencias', 'GET'): 0,
+    ('temporadas.get_temporadas', 'GET'): 1,
+    ('temporadas.create_temporada', 'POST'): 5,
+    ('temporadas.archivar_temporada', 'POST'): 8,
+    ('temporadas.restaurar_temporada', 'POST'): 8,
+    ('temporadas.get_asistencias_archivadas', 'GET'): 2,
+    ('temporadas.reporte_temporada_archivada', 'GET'): 3,
+    ('auth.login', 'POST'): 1,
+    ('auth.verify', 'GET'): 1,
+    ('auth.register', 'POST'): 4,
+    ('debug.get_profiles', 'GET'): 0,
+    ('debug.download_profile', 'GET'): 0,
+    ('debug.download_profile_queries', 'GET'): 0,
+}
+
+
+def _csv(texto):
+    return {'file': (io.BytesIO(texto.encode('utf-8')), 'datos.csv')}
+
+
+# Petición de ejemplo por endpoint: (url, kwargs para el test client)
+CASOS = {
+    ('usuarios.get_usuarios', 'GET'): ('/api/usuarios', {}),
+    ('usuarios.create_usuario', 'POST'): ('/api/usuarios', {'json': {'nombre': 'Nuevo', 'instrumento': 'Oboe'}}),
+    ('usuarios.update_usuario', 'PUT'): ('/api/usuarios/1', {'json': {'nombre': 'Renombrado', 'instrumento': 'Oboe'}}),
+    ('usuarios.delete_usuario', 'DELETE'): ('/api/usuarios/1', {}),
+    ('usuarios.import_usuarios', 'POST'): ('/api/usuarios/import', {
+        'data': _csv('nombre,instrumento\nNuevo 1,Oboe\nNuevo 2,Tuba\nUsuario 1,Flauta\n')}),
+    ('usuarios.download_rechazos_usuarios', 'GET'): ('/api/usuarios/import/rechazos/{rechazos_usuarios}', {}),
+    ('eventos.get_eventos', 'GET'): ('/api/eventos', {}),
+    ('eventos.create_evento', 'POST'): ('/api/eventos', {'json': {'fecha': '2031-01-01'}}),
+    ('eventos.update_evento', 'PUT'): ('/api/eventos/{evento_libre}', {'json': {'fecha': '2031-02-01'}}),
+    ('eventos.delete_evento', 'DELETE'): ('/api/eventos/{evento_libre}', {}),
+    ('asistencias.get_asistencias', 'GET'): ('/api/asistencias', {}),
+    ('asistencias.create_asistencia', 'POST'): ('/api/asistencias', {
+        'json': {'id_usuario': 1, 'id_evento': '{evento_libre}', 'id_tipo': 1}}),
+    ('asistencias.update_asistencia', 'PUT'): ('/api/asistencias/1/1', {'json': {'id_tipo': 2}}),
+    ('asistencias.delete_asistencia', 'DELETE'): ('/api/asistencias/1/1', {}),
+    ('asistencias.aplicar_mutaciones', 'POST'): ('/api/asistencias/mutations', {'json': {'operaciones': [
+        {'clave': 'm1', 'op': 'create', 'id_usuario': 1, 'id_evento': '{evento_libre}', 'id_tipo': 1},
+        {'clave': 'm2', 'op': 'update', 'id_usuario': 2, 'id_evento': 1, 'id_tipo': 2},
+        {'clave': 'm3', 'op': 'delete', 'id_usuario': 3, 'id_evento': 1},
+        {'clave': 'm1', 'op': 'create', 'id_usuario': 1, 'id_evento': '{evento_libre}', 'id_tipo': 1},
+    ]}}),
+    ('asistencias.reporte_por_fecha', 'GET'): ('/api/asistencias/reporte-por-fecha', {}),
+    ('asistencias.exportar_reporte', 'GET'): ('/api/asistencias/reporte-por-fecha/exportar?formato=xlsx', {}),
+    ('asistencias.exportar_historial', 'GET'): ('/api/asistencias/exportar-historial?formato=parquet', {}),
+    ('asistencias.delete_all_asistencias', 'DELETE'): ('/api/asistencias/delete-all', {}),
+    ('asistencias.delete_asistencias_by_user', 'DELETE'): ('/api/asistencias/delete-by-user/1', {}),
+    ('asistencias.get_tipos_asistencia', 'GET'): ('/api/asistencias/tipos', {}),
+    ('asistencias.import_asistencias', 'POST'): ('/api/asistencias/import', {
+        'data': _csv('fecha,usuario,estado\n2031-03-01,Usuario 1,asistio\n2031-03-01,Usuario 2,falta\n'
+                     '2031-03-02,Usuario 1,permiso\n2031-03-02,Nadie,asistio\n')}),
+    ('asistencias.download_rechazos_asistencias', 'GET'): ('/api/asistencias/import/rechazos/{rechazos_asistencias}', {}),
+    ('temporadas.get_temporadas', 'GET'): ('/api/temporadas', {}),
+    ('temporadas.create_temporada', 'POST'): ('/api/temporadas', {
+        'json': {'nombre': 'Nueva', 'fecha_inicio': '2032-01-01', 'fecha_fin': '2032-12-31'}}),
+    ('temporadas.archivar_temporada', 'POST'): ('/api/temporadas/1/archivar', {}),
+    ('temporadas.restaurar_temporada', 'POST'): ('/api/temporadas/2/restaurar', {}),
+    ('temporadas.get_asistencias_archivadas', 'GET'): ('/api/temporadas/2/asistencias', {}),
+    ('temporadas.reporte_temporada_archivada', 'GET'): ('/api/temporadas/2/reporte-por-fecha', {}),
+    ('auth.login', 'POST'): ('/api/auth/login', {'json': {'username': 'admin', 'password': 'secreto123'}}),
+    ('auth.verify', 'GET'): ('/api/auth/verify', {}),
+    ('auth.register', 'POST'): ('/api/auth/register', {'json': {'username': 'otro', 'password': 'secreto123'}}),
+    ('debug.get_profiles', 'GET'): ('/api/debug/profiles', {}),
+    ('debug.download_profile', 'GET'): ('/api/debug/profiles/{perfil}', {}),
+    ('debug.download_profile_queries', 'GET'): ('/api/debug/profiles/{perfil}/consultas', {}),
+}
+
+_password_hash = None
+
+
+def sembrar(n_usuarios, n_eventos):
+    """Recrea el esquema y carga un conjunto de datos de tamaño dado."""
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = bcrypt.generate_password_hash('secreto123').decode('utf-8')
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+    inicio = date(2020, 1, 6)
+    evento_libre = n_eventos + 1
+    db.session.execute(insert(Agrupacion), [{'id_agrupacion': 1, 'nombre': 'Principal'}])
+    db.session.execute(insert(VersionDatos), [{'id_agrupacion': 1, 'version': 1}])
+    db.session.execute(insert(TipoAsistencia), [
+        {'id_tipo': i, 'descripcion': d}
+        for i, d in enumerate(['Asistió', 'No asistió', 'Con permiso', 'No convocado'], start=1)
+    ])
+    db.session.execute(insert(Admin), [{
+        'id_agrupacion': 1, 'username': 'admin', 'password_hash': _password_hash, 'nombre_completo': 'Admin'
+    }])
+    db.session.execute(insert(Usuario), [
+        {'id_usuario': i, 'id_agrupacion': 1, 'nombre': f'Usuario {i}', 'instrumento': 'Flauta'}
+        for i in range(1, n_usuarios + 1)
+    ])
+    db.session.execute(insert(Evento), [
+        {'id_evento': i, 'id_agrupacion': 1, 'fecha': inicio + timedelta(days=7 * i)}
+        for i in range(1, n_eventos + 1)
+    ] + [{'id_evento': evento_libre, 'id_agrupacion': 1, 'fecha': date(2030, 1, 1)}])
+    db.session.execute(insert(Asistencia), [
+        {'id_usuario': u, 'id_evento': e, 'id_tipo': (u + e) % 3 + 1, 'id_agrupacion': 1}
+        for u in range(1, n_usuarios + 1) for e in range(1, n_eventos + 1)
+    ])
+    db.session.execute(insert(Temporada), [
+        {'id_temporada': 1, 'id_agrupacion': 1, 'nombre': 'Cerrada',
+         'fecha_inicio': date(2020, 1, 1), 'fecha_fin': date(2021, 12, 31), 'archivada': False},
+        {'id_temporada': 2, 'id_agrupacion': 1, 'nombre': 'Archivada',
+         'fecha_inicio': date(2019, 1, 1), 'fecha_fin': date(2019, 12, 31), 'archivada': True},
+    ])
+    db.session.commit()
+    db.session.remove()
+    return {'evento_libre': evento_libre}
+
+
+def sembrar_archivos(cliente, headers):
+    """Crea un CSV de rechazos por tipo de importación y un perfil reales, para
+    que las descargas se midan sirviendo un archivo y no en el 404 temprano.
+
+    Viven en los directorios temporales de la corrida, que sembrar() no toca.
+    """
+    archivos = {}
+    for tipo, columnas in (('usuarios', ['nombre', 'instrumento']), ('asistencias', ['fecha', 'usuario', 'estado'])):
+        reporte = ReporteValidacion(columnas)
+        reporte.rechazar('datos_incompletos', 2, 'Línea 2: datos incompletos', {c: '' for c in columnas})
+        archivos[f'rechazos_{tipo}'] = reporte.respuesta(0, tipo, 1)['id_rechazos']
+
+    cliente.get('/api/usuarios', headers={**headers, 'X-Profile': '1'}).close()
+    archivos['perfil'] = listar_perfiles(current_app.config['PROFILES_DIR'], 1)[0]['id']
+    return archivos
+
+
+def _formatear(valor, contexto):
+    if isinstance(valor, str):
+        valor = valor.format(**contexto)
+        return int(valor) if valor.isdigit() else valor
+    if isinstance(valor, dict):
+        return {k: _formatear(v, contexto) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_formatear(v, contexto) for v in valor]
+    return valor
+
+
+def contar_sentencias(engine, cliente, clave, contexto, headers):
+    url, kwargs = CASOS[clave]
+    url = _formatear(url, contexto)
+    kwargs = dict(kwargs)
+    if 'json' in kwargs:
+        kwargs['json'] = _formatear(kwargs['json'], contexto)
+    if 'data' in kwargs:
+        # Los archivos se consumen al enviarse: se recrean en cada ejecución
+        nombre_archivo, archivo = kwargs['data']['file'][1], kwargs['data']['file'][0]
+        kwargs['data'] = {'file': (io.BytesIO(archivo.getvalue()), nombre_archivo)}
+
+    hilo = threading.get_ident()
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        # Solo las del hilo de la petición (no los exportes en segundo plano)
+        if threading.get_ident() == hilo:
+            sentencias.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        respuesta = cliente.open(url, method=clave[1], headers=headers, **kwargs)
+        respuesta.close()
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
+
+    # Esperar a que terminen los exportes encolados antes de recrear la base
+    for futuro in list(exportes._pendientes.values()):
+        futuro.exception()
+
+    return len(sentencias), respuesta.status_code
+
+
+def main():
+    app = create_app()
+    # Directorios de archivos vacíos y propios de esta corrida: los exportes o
+    # perfiles que quedaron en instance/ de corridas anteriores cambiarían el conteo
+    temporal = tempfile.mkdtemp(prefix='check_consultas-')
+    atexit.register(shutil.rmtree, temporal, ignore_errors=True)
+    for clave, nombre in (('EXPORTES_DIR', 'exportes'), ('PROFILES_DIR', 'profiles'), ('RECHAZOS_DIR', 'rechazos')):
+        app.config[clave] = os.path.join(temporal, nombre)
+        os.makedirs(app.config[clave])
+    cliente = app.test_client()
+    errores = []
+
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={'username': 'admin', 'id_agrupacion': 1})
+        engine = db.engine
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with app.app_context():
+        sembrar(*TAMANIOS['chico'])
+        archivos = sembrar_archivos(cliente, headers)
+
+    claves = sorted(
+        (regla.endpoint, metodo)
+        for regla in app.url_map.iter_rules()
+        if '.' in regla.endpoint
+        for metodo in regla.methods - {'HEAD', 'OPTIONS'}
+    )
+
+    resultados = {}
+    for tamanio, (n_usuarios, n_eventos) in TAMANIOS.items():
+        for clave in claves:
+            if clave not in CASOS or clave not in PRESUPUESTOS:
+                continue
+            with app.app_context():
+                contexto = {**sembrar(n_usuarios, n_eventos), **archivos}
+            resultados.setdefault(clave, {})[tamanio] = contar_sentencias(engine, cliente, clave, contexto, headers)
+
+    print(f"\n{'ENDPOINT':<50} {'MÉTODO':<7} {'CHICO':>6} {'GRANDE':>7} {'PRESUP.':>8}")
+    print('-' * 82)
+    for clave in claves:
+        if clave not in CASOS or clave not in PRESUPUESTOS:
+            errores.append(f'{clave[1]} {clave[0]}: sin caso o presupuesto declarado')
+            continue
+        presupuesto = PRESUPUESTOS[clave]
+        (chico, status_chico), (grande, status_grande) = resultados[clave]['chico'], resultados[clave]['grande']
+        marca = ''
+        if grande > chico:
+            errores.append(f'{clave[1]} {clave[0]}: las sentencias crecen con los datos ({chico} -> {grande})')
+            marca = '  ✗ crece'
+        if max(chico, grande) > presupuesto:
+            errores.append(f'{clave[1]} {clave[0]}: {max(chico, grande)} sentencias, presupuesto {presupuesto}')
+            marca += '  ✗ presupuesto'
+        if status_chico >= 500 or status_grande >= 500:
+            errores.append(f'{clave[1]} {clave[0]}: respondió {status_chico}/{status_grande}')
+            marca += '  ✗ error'
+        print(f'{clave[0]:<50} {clave[1]:<7} {chico:>6} {grande:>7} {presupuesto:>8}{marca}')
+
+    if errores:
+        print(f'\n✗ {len(errores)} problema(s):')
+        for error in errores:
+            print(f'  - {error}')
+        sys.exit(1)
+
+    print(f'\n✓ {len(claves)} endpoints dentro del presupuesto')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+# cli.py
+"""Comandos `flask datos ...` para carga masiva, datos de referencia y mantenimiento.
+
+    flask datos cargar-usuarios usuarios.csv
+    flask datos cargar-eventos eventos.csv
+    flask datos cargar-asistencias historial.csv
+    flask datos sembrar-tipos
+    flask datos exportar-historial historial.parquet
+    flask datos analizar | vacuum | reindexar | limpiar-huerfanos | unificar-eventos
+
+Las cargas escriben en PostgreSQL con COPY a una tabla temporal seguida de un
+único INSERT ... SELECT ... ON CONFLICT DO NOTHING, y en SQLite con
+executemany en lotes grandes dentro de una sola transacción. Las filas que ya
+existen se ignoran, así que repetir una carga es seguro.
+"""
+import csv
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, delete, exists, text
+from sqlalchemy.dialects import sqlite
+
+import columnar
+from extensions import db
+from models import (Usuario, Evento, Asistencia, TipoAsistencia,
+                    EventoArchivo, AsistenciaArchivo)
+from routes.asistencias import ESTADO_MAPPINGS
+from routes.eventos import obtener_o_crear_eventos, unificar_eventos_duplicados, fechas_archivadas
+import exportes
+from tenancy import AGRUPACION_POR_DEFECTO
+
+datos_cli = AppGroup('datos', help='Carga masiva, datos de referencia y mantenimiento de la base.')
+
+TIPOS_ASISTENCIA = ['Asistió', 'No asistió', 'Con permiso', 'No convocado']
+
+TAMANIO_LOTE = 10000
+
+opcion_agrupacion = click.option(
+    '--agrupacion', 'id_agrupacion', type=int, default=AGRUPACION_POR_DEFECTO, show_default=True,
+    help='Agrupación a la que se cargan los datos.'
+)
+opcion_encoding = click.option('--encoding', default='utf-8-sig', show_default=True, help='Codificación del CSV.')
+
+
+def _leer_csv(ruta, encoding):
+    """Itera las filas del CSV como dicts, con los encabezados normalizados."""
+    with open(ruta, newline='', encoding=encoding) as f:
+        primera = f.readline()
+        f.seek(0)
+        delimiter = '\t' if '\t' in primera else ';' if ';' in primera else ','
+        reader = csv.DictReader(f, delimiter=delimiter)
+        if reader.fieldnames:
+            reader.fieldnames = [h.strip().lower() for h in reader.fieldnames]
+        for row in reader:
+            yield {k: (v or '').strip() for k, v in row.items() if k}
+
+
+def _parse_fecha(valor):
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _insertar_masivo(tabla, columnas, filas):
+    """Inserta tuplas en `tabla` ignorando las que chocan con una restricción única.
+
+    Devuelve la cantidad de filas realmente insertadas. No hace commit.
+    """
+    conn = db.session.connection()
+    dialecto = conn.dialect.name
+
+    if dialecto == 'postgresql':
+        # COPY a una tabla temporal y de ahí un solo INSERT ... SELECT
+        temporal = f'_carga_{tabla.name}'
+        lista = ', '.join(columnas)
+        conn.execute(text(
+            f'CREATE TEMP TABLE {temporal} ON COMMIT DROP AS SELECT {lista} FROM {tabla.name} WITH NO DATA'
+        ))
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024, mode='w+', newline='') as buffer:
+            writer = csv.writer(buffer)
+            for fila in filas:
+                writer.writerow(['\\N' if v is None else v for v in fila])
+            buffer.seek(0)
+            cursor = conn.connection.cursor()
+            cursor.copy_expert(f"COPY {temporal} ({lista}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        return conn.execute(text(
+            f'INSERT INTO {tabla.name} ({lista}) SELECT {lista} FROM {temporal} ON CONFLICT DO NOTHING'
+        )).rowcount
+
+    if dialecto == 'sqlite':
+        stmt = sqlite.insert(tabla).on_conflict_do_nothing()
+    else:
+        stmt = insert(tabla)
+
+    insertadas = 0
+    lote = []
+    for fila in filas:
+        lote.append(dict(zip(columnas, fila)))
+        if len(lote) >= TAMANIO_LOTE:
+            insertadas += conn.execute(stmt, lote).rowcount
+            lote = []
+    if lote:
+        insertadas += conn.execute(stmt, lote).rowcount
+    return insertadas
+
+
+def _resumen(insertadas, leidas, rechazos):
+    click.echo(f'✓ {insertadas} fila(s) insertada(s) de {leidas} leída(s)'
+               f' ({leidas - insertadas - sum(rechazos.values())} ya existían)')
+    for motivo, cantidad in rechazos.most_common():
+        click.echo(f'  ✗ {cantidad} rechazada(s): {motivo}')
+
+
+@datos_cli.command('cargar-usuarios')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@opcion_agrupacion
+@opcion_encoding
+def cargar_usuarios(archivo, id_agrupacion, encoding):
+    """Carga usuarios desde un CSV con columnas nombre[,instrumento,email,telefono]."""
+    leidas = 0
+    rechazos = Counter()
+
+    def filas():
+        nonlocal leidas
+        for row in _leer_csv(archivo, encoding):
+            leidas += 1
+            if not row.get('nombre'):
+                rechazos['nombre vacío'] += 1
+                continue
+            yield (id_agrupacion, row['nombre'], row.get('instrumento') or None,
+                   row.get('email') or None, row.get('telefono') or None)
+
+    insertadas = _insertar_masivo(
+        Usuario.__table__, ['id_agrupacion', 'nombre', 'instrumento', 'email', 'telefono'], filas()
+    )
+    db.session.commit()
+    exportes.incrementar_version(id_agrupacion)
+    _resumen(insertadas, leidas, rechazos)
+
+
+@datos_cli.command('cargar-eventos')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@opcion_agrupacion
+@opcion_encoding
+def cargar_eventos(archivo, id_agrupacion, encoding):
+    """Carga eventos desde un CSV con una columna fecha (AAAA-MM-DD o DD/MM/AAAA)."""
+    leidas = 0
+    rechazos = Counter()
+    fechas = set()
+    for row in _leer_csv(archivo, encoding):
+        leidas += 1
+        fecha = _parse_fecha(row.get('fecha', ''))
+        if fecha is None:
+            rechazos['fecha inválida'] += 1
+            continue
+        fechas.add(fecha)
+
+    # Un evento en una temporada archivada impediría restaurarla
+    archivadas = fechas_archivadas(id_agrupacion, fechas)
+    if archivadas:
+        rechazos['fecha en temporada archivada'] += len(archivadas)
+
+    creadas = 0
+    fechas = sorted(fechas - archivadas)
+    for i in range(0, len(fechas), TAMANIO_LOTE):
+        creadas += len(obtener_o_crear_eventos(id_agrupacion, fechas[i:i + TAMANIO_LOTE])[1])
+    db.session.commit()
+    exportes.incrementar_version(id_agrupacion)
+    _resumen(creadas, leidas, rechazos)
+
+
+@datos_cli.command('cargar-asistencias')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@opcion_agrupacion
+@opcion_encoding
+def cargar_asistencias(archivo, id_agrupacion, encoding):
+    """Carga asistencias desde un CSV con columnas fecha,usuario,estado.
+
+    Los eventos que falten se crean; los usuarios deben existir.
+    """
+    usuarios_map = dict(db.session.execute(
+        select(Usuario.nombre, Usuario.id_usuario).where(Usuario.id_agrupacion == id_agrupacion)
+    ).tuples().all())
+    tipos_map = {
+        descripcion.lower().strip(): id_tipo
+        for descripcion, id_tipo in db.session.execute(select(TipoAsistencia.descripcion, TipoAsistencia.id_tipo))
+    }
+
+    leidas = 0
+    rechazos = Counter()
+    pendientes = []
+    for row in _leer_csv(archivo, encoding):
+        leidas += 1
+        fecha = _parse_fecha(row.get('fecha', ''))
+        id_usuario = usuarios_map.get(row.get('usuario', ''))
+        estado = row.get('estado', '').lower()
+        id_tipo = tipos_map.get(ESTADO_MAPPINGS.get(estado, estado).lower())
+        if fecha is None:
+            rechazos['fecha inválida'] += 1
+        elif id_usuario is None:
+            rechazos['usuario no encontrado'] += 1
+        elif id_tipo is None:
+            rechazos['estado no válido'] += 1
+        else:
+            pendientes.append((id_usuario, fecha, id_tipo))
+
+    archivadas = fechas_archivadas(id_agrupacion, {fecha for _, fecha, _ in pendientes})
+    if archivadas:
+        rechazos['fecha en temporada archivada'] += sum(1 for _, fecha, _ in pendientes if fecha in archivadas)
+        pendientes = [p for p in pendientes if p[1] not in archivadas]
+
+    eventos = {}
+    fechas = sorted({fecha for _, fecha, _ in pendientes})
+    for i in range(0, len(fechas), TAMANIO_LOTE):
+        eventos.update(obtener_o_crear_eventos(id_agrupacion, fechas[i:i + TAMANIO_LOTE])[0])
+
+    insertadas = _insertar_masivo(
+        Asistencia.__table__, ['id_usuario', 'id_evento', 'id_tipo', 'id_agrupacion'],
+        ((id_usuario, eventos[fecha], id_tipo, id_agrupacion) for id_usuario, fecha, id_tipo in pendientes)
+    )
+    db.session.commit()
+    exportes.incrementar_version(id_agrupacion)
+    _resumen(insertadas, leidas, rechazos)
+
+
+@datos_cli.command('sembrar-tipos')
+def sembrar_tipos():
+    """Crea los tipos de asistencia de referencia que falten."""
+    existentes = set(db.session.scalars(select(TipoAsistencia.descripcion)))
+    nuevos = [d for d in TIPOS_ASISTENCIA if d not in existentes]
+    if nuevos:
+        db.session.execute(insert(TipoAsistencia), [{'descripcion': d} for d in nuevos])
+        db.session.commit()
+    click.echo(f'✓ {len(nuevos)} tipo(s) creado(s)')
+    for id_tipo, descripcion in db.session.execute(
+            select(TipoAsistencia.id_tipo, TipoAsistencia.descripcion).order_by(TipoAsistencia.id_tipo)):
+        click.echo(f"  ID: {id_tipo} - Descripción: '{descripcion}'")
+
+
+@datos_cli.command('exportar-historial')
+@click.argument('salida', type=click.Path(dir_okay=False, writable=True))
+@click.option('--formato', type=click.Choice(sorted(columnar.FORMATOS)), default='parquet', show_default=True)
+@click.option('--sin-archivadas', is_flag=True, help='Omite las temporadas archivadas.')
+@opcion_agrupacion
+def exportar_historial(salida, formato, sin_archivadas, id_agrupacion):
+    """Exporta el historial de asistencias (con las temporadas archivadas) a Parquet o Arrow IPC."""
+    total = columnar.escribir_historial(salida, formato, id_agrupacion, incluir_archivadas=not sin_archivadas)
+    click.echo(f'✓ {total} fila(s) exportada(s) a {salida}')
+
+
+def _ejecutar_fuera_de_transaccion(*sentencias):
+    # VACUUM (y REINDEX en algunos motores) no pueden correr dentro de una transacción
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for sentencia in sentencias:
+            click.echo(f'  {sentencia}')
+            conn.execute(text(sentencia))
+
+
+@datos_cli.command('analizar')
+def analizar():
+    """Actualiza las estadísticas del planificador (ANALYZE)."""
+    _ejecutar_fuera_de_transaccion('ANALYZE')
+    click.echo('✓ Estadísticas actualizadas')
+
+
+@datos_cli.command('vacuum')
+def vacuum():
+    """Recupera espacio libre y actualiza estadísticas (VACUUM)."""
+    if db.engine.dialect.name == 'postgresql':
+        _ejecutar_fuera_de_transaccion('VACUUM (ANALYZE)')
+    else:
+        _ejecutar_fuera_de_transaccion('VACUUM', 'ANALYZE')
+    click.echo('✓ VACUUM completado')
+
+
+@datos_cli.command('reindexar')
+def reindexar():
+    """Reconstruye los índices de las tablas de la aplicación."""
+    if db.engine.dialect.name == 'postgresql':
+        _ejecutar_fuera_de_transaccion(*(f'REINDEX TABLE {t.name}' for t in db.metadata.sorted_tables))
+    else:
+        _ejecutar_fuera_de_transaccion('REINDEX')
+    click.echo('✓ Índices reconstruidos')
+
+
+@datos_cli.command('limpiar-huerfanos')
+def limpiar_huerfanos():
+    """Elimina asistencias cuyo usuario, evento o tipo ya no existe."""
+    objetivos = [
+        (Asistencia, Evento),
+        (AsistenciaArchivo, EventoArchivo),
+    ]
+    afectadas = set()
+    for modelo, evento_model in objetivos:
+        huerfana = (
+            ~exists().where(Usuario.id_usuario == modelo.id_usuario)
+            | ~exists().where(evento_model.id_evento == modelo.id_evento)
+            | ~exists().where(TipoAsistencia.id_tipo == modelo.id_tipo)
+        )
+        afectadas.update(db.session.scalars(select(modelo.id_agrupacion).where(huerfana).distinct()))
+        eliminadas = db.session.execute(
+            delete(modelo).where(huerfana),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        click.echo(f'  {modelo.__tablename__}: {eliminadas} fila(s) huérfana(s) eliminada(s)')
+    db.session.commit()
+    # Los exportes ya generados de esas agrupaciones incluían las filas borradas
+    for id_agrupacion in sorted(afectadas):
+        exportes.incrementar_version(id_agrupacion)
+    click.echo('✓ Limpieza completada')
+
+
+@datos_cli.command('unificar-eventos')
+def unificar_eventos():
+    """Deja un solo evento por fecha en cada agrupación, moviendo sus asistencias."""
+    unificadas = unificar_eventos_duplicados(db.session.connection())
+    db.session.commit()
+    for id_agrupacion in sorted(unificadas):
+        exportes.incrementar_version(id_agrupacion)
+        click.echo(f'  agrupación {id_agrupacion}: eventos duplicados unificados')
+    click.echo('✓ Eventos unificados')
@@ -0,0 +1,115 @@
+# columnar.py
+"""Exportación del historial de asistencias en formato columnar (Arrow IPC o Parquet).
+
+Las columnas usuario, instrumento y estado van codificadas como diccionario.
+Los diccionarios se arman una sola vez con los usuarios y tipos de la
+agrupación, así que la consulta principal solo trae enteros y fechas. Por
+defecto incluye las temporadas archivadas (UNION ALL con las tablas de
+archivo), porque el historial es el que se usa para análisis. Se lee
+con un cursor del lado del servidor y se escribe por lotes, sin cargar el
+historial completo en memoria.
+"""
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, union_all
+
+from extensions import db
+from models import Usuario, Evento, Asistencia, TipoAsistencia, EventoArchivo, AsistenciaArchivo
+
+FORMATOS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+
+_DICCIONARIO = pa.dictionary(pa.int32(), pa.string())
+
+ESQUEMA = pa.schema([
+    ('fecha', pa.date32()),
+    ('id_evento', pa.int32()),
+    ('id_usuario', pa.int32()),
+    ('usuario', _DICCIONARIO),
+    ('instrumento', _DICCIONARIO),
+    ('estado', _DICCIONARIO),
+])
+
+
+def _diccionarios(id_agrupacion):
+    usuarios = db.session.execute(
+        select(Usuario.id_usuario, Usuario.nombre, Usuario.instrumento)
+        .where(Usuario.id_agrupacion == id_agrupacion)
+        .order_by(Usuario.nombre)
+    ).all()
+    tipos = db.session.execute(
+        select(TipoAsistencia.id_tipo, TipoAsistencia.descripcion).order_by(TipoAsistencia.id_tipo)
+    ).all()
+
+    instrumentos = sorted({ins for _, _, ins in usuarios if ins})
+    indice_instrumento = {ins: i for i, ins in enumerate(instrumentos)}
+
+    return {
+        'usuario': pa.array([nombre for _, nombre, _ in usuarios], pa.string()),
+        'instrumento': pa.array(instrumentos, pa.string()),
+        'estado': pa.array([descripcion for _, descripcion in tipos], pa.string()),
+        'indice_usuario': {id_usuario: i for i, (id_usuario, _, _) in enumerate(usuarios)},
+        'indice_instrumento_usuario': {
+            id_usuario: indice_instrumento.get(ins) for id_usuario, _, ins in usuarios
+        },
+        'indice_estado': {id_tipo: i for i, (id_tipo, _) in enumerate(tipos)},
+    }
+
+
+def _lote(filas, dic):
+    fechas, id_eventos, id_usuarios, id_tipos = zip(*filas)
+    indice_usuario = dic['indice_usuario']
+    indice_instrumento = dic['indice_instrumento_usuario']
+    indice_estado = dic['indice_estado']
+    return pa.record_batch([
+        pa.array(fechas, pa.date32()),
+        pa.array(id_eventos, pa.int32()),
+        pa.array(id_usuarios, pa.int32()),
+        pa.DictionaryArray.from_arrays(
+            pa.array([indice_usuario[u] for u in id_usuarios], pa.int32()), dic['usuario']),
+        pa.DictionaryArray.from_arrays(
+            pa.array([indice_instrumento[u] for u in id_usuarios], pa.int32()), dic['instrumento']),
+        pa.DictionaryArray.from_arrays(
+            pa.array([indice_estado[t] for t in id_tipos], pa.int32()), dic['estado']),
+    ], schema=ESQUEMA)
+
+
+def _consulta_asistencias(evento_model, asistencia_model, id_agrupacion):
+    # El join con usuario descarta filas huérfanas, que no tendrían entrada en el diccionario
+    return select(evento_model.fecha, asistencia_model.id_evento, asistencia_model.id_usuario,
+                  asistencia_model.id_tipo)\
+        .join(evento_model, asistencia_model.id_evento == evento_model.id_evento)\
+        .join(Usuario, asistencia_model.id_usuario == Usuario.id_usuario)\
+        .where(asistencia_model.id_agrupacion == id_agrupacion)
+
+
+def escribir_historial(destino, formato, id_agrupacion, tamanio_lote=65536, incluir_archivadas=True):
+    """Escribe el historial de asistencias de la agrupación en `destino` (ruta o archivo binario).
+
+    Con `incluir_archivadas` se agregan las asistencias de temporadas archivadas.
+    Devuelve la cantidad de filas escritas.
+    """
+    dic = _diccionarios(id_agrupacion)
+    consultas = [_consulta_asistencias(Evento, Asistencia, id_agrupacion)]
+    if incluir_archivadas:
+        consultas.append(_consulta_asistencias(EventoArchivo, AsistenciaArchivo, id_agrupacion))
+    historial = union_all(*consultas).subquery()
+    stmt = select(historial).order_by(historial.c.fecha, historial.c.id_usuario)
+
+    if formato == 'parquet':
+        writer = pq.ParquetWriter(destino, ESQUEMA, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(destino, ESQUEMA)
+
+    total = 0
+    try:
+        # stream_results usa un cursor del lado del servidor en PostgreSQL
+        resultado = db.session.execute(stmt.execution_options(stream_results=True, yield_per=tamanio_lote))
+        for filas in resultado.partitions(tamanio_lote):
+            writer.write_batch(_lote(filas, dic))
+            total += len(filas)
+    finally:
+        writer.close()
+    return total
@@ -6,4 +6,8 @@ load_dotenv()
 class Config:
     basedir = os.path.abspath(os.path.dirname(__file__))
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or f'sqlite:///{os.path.join(basedir, "asistencias.db")}'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Despliegue de una sola agrupación: las peticiones sin token (o con tokens
+    # anteriores a la multi-agrupación) usan la agrupación por defecto. Apagado,
+    # las rutas con datos de agrupación exigen el claim 'id_agrupacion' del JWT.
+    AGRUPACION_UNICA = os.getenv('AGRUPACION_UNICA', '').lower() in ('1', 'true', 'si', 'sí')
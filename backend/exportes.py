@@ -0,0 +1,208 @@
+# exportes.py
+"""Generación de exportes XLSX/PDF del reporte de asistencias en segundo plano.
+
+Cada archivo se guarda en disco con una clave formada por la agrupación, la
+versión de sus datos y los filtros, de modo que las descargas repetidas se
+sirven directamente desde el archivo hasta que algo cambie.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+from fpdf import FPDF
+from openpyxl import Workbook
+from sqlalchemy import update
+
+from extensions import db
+from models import Evento, VersionDatos
+from reportes import construir_reporte
+from tenancy import get_agrupacion_id
+
+FORMATOS = ('xlsx', 'pdf')
+
+# Blueprints cuyas escrituras invalidan los exportes de la agrupación
+BLUEPRINTS_CON_DATOS = {'usuarios', 'eventos', 'asistencias', 'temporadas'}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='exportes')
+# Generaciones en curso por nombre de archivo; al terminar salen del dict.
+# Los errores se guardan aparte hasta que la siguiente consulta los informa.
+_pendientes = {}
+_errores = {}
+_lock = threading.Lock()
+
+
+def init_app(app):
+    app.config.setdefault('EXPORTES_DIR', os.path.join(app.instance_path, 'exportes'))
+    os.makedirs(app.config['EXPORTES_DIR'], exist_ok=True)
+
+    @app.after_request
+    def incrementar_version_tras_escritura(response):
+        if (request.method in ('POST', 'PUT', 'PATCH', 'DELETE')
+                and request.blueprint in BLUEPRINTS_CON_DATOS
+                and response.status_code < 400):
+            incrementar_version(get_agrupacion_id())
+        return response
+
+
+def obtener_version(id_agrupacion):
+    version = db.session.query(VersionDatos.version)\
+        .filter(VersionDatos.id_agrupacion == id_agrupacion)\
+        .scalar()
+    return version or 0
+
+
+def incrementar_version(id_agrupacion):
+    try:
+        actualizadas = db.session.execute(
+            update(VersionDatos)
+            .where(VersionDatos.id_agrupacion == id_agrupacion)
+            .values(version=VersionDatos.version + 1)
+        ).rowcount
+        if not actualizadas:
+            db.session.add(VersionDatos(id_agrupacion=id_agrupacion, version=1))
+        db.session.commit()
+    except Exception as e:
+        # Otro proceso pudo haber creado la fila al mismo tiempo; el siguiente cambio la incrementará
+        db.session.rollback()
+        print(f"⚠ No se pudo incrementar la versión de datos: {e}")
+
+
+def solicitar_exportacion(app, id_agrupacion, formato, desde=None, hasta=None):
+    """Devuelve (ruta, None) si el archivo ya existe o (None, estado) si se está generando.
+
+    La primera petición para una clave encola la generación en un thread de
+    fondo; las siguientes solo consultan su estado hasta que el archivo aparece.
+    """
+    version = obtener_version(id_agrupacion)
+    filtros = f"{desde or ''}|{hasta or ''}"
+    huella = hashlib.sha1(filtros.encode('utf-8')).hexdigest()[:12]
+    prefijo = f"{id_agrupacion}-"
+    nombre = f"{prefijo}v{version}-{huella}.{formato}"
+    ruta = os.path.join(app.config['EXPORTES_DIR'], nombre)
+
+    if os.path.exists(ruta):
+        return ruta, None
+
+    with _lock:
+        error = _errores.pop(nombre, None)
+        if error is not None:
+            return None, {'estado': 'error', 'error': error}
+        if nombre not in _pendientes:
+            # Pudo haber terminado entre la comprobación de arriba y el lock
+            if os.path.exists(ruta):
+                return ruta, None
+            futuro = _executor.submit(_generar, app, id_agrupacion, formato, desde, hasta, ruta, prefijo)
+            _pendientes[nombre] = futuro
+        else:
+            futuro = None
+    if futuro is not None:
+        # Fuera del lock: si el futuro ya terminó, el callback corre en este mismo thread
+        futuro.add_done_callback(lambda f: _terminar(nombre, f))
+
+    return None, {'estado': 'generando'}
+
+
+def _terminar(nombre, futuro):
+    with _lock:
+        _pendientes.pop(nombre, None)
+        error = futuro.exception()
+        if error is not None:
+            _errores[nombre] = str(error)
+
+
+def _generar(app, id_agrupacion, formato, desde, hasta, ruta, prefijo):
+    with app.app_context():
+        filtros = []
+        if desde:
+            filtros.append(Evento.fecha >= desde)
+        if hasta:
+            filtros.append(Evento.fecha <= hasta)
+        reporte = construir_reporte(id_agrupacion, filtros=filtros)
+        db.session.remove()
+
+    # Se escribe en un temporal y se renombra, para no servir nunca un archivo a medias
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    try:
+        if formato == 'xlsx':
+            _escribir_xlsx(reporte, temporal)
+        else:
+            _escribir_pdf(reporte, temporal)
+        os.replace(temporal, ruta)
+    except Exception:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+
+    # La versión vigente se consulta ahora: si mientras tanto hubo cambios, este
+    # archivo ya es viejo y no debe borrar los de versiones más nuevas
+    with app.app_context():
+        version_actual = obtener_version(id_agrupacion)
+        db.session.remove()
+    _limpiar_versiones_viejas(os.path.dirname(ruta), prefijo, version_actual, os.path.basename(ruta))
+
+
+def _limpiar_versiones_viejas(directorio, prefijo, version_actual, conservar):
+    """Borra los exportes de la agrupación con versión menor a `version_actual`.
+
+    `conservar` (el archivo recién generado) no se borra aunque sea viejo, porque
+    quien lo pidió puede estar por descargarlo.
+    """
+    for nombre in os.listdir(directorio):
+        if not nombre.startswith(prefijo) or nombre.endswith('.tmp') or nombre == conservar:
+            continue
+        try:
+            version = int(nombre.split('-')[1].lstrip('v'))
+        except (IndexError, ValueError):
+            continue
+        if version < version_actual:
+            try:
+                os.remove(os.path.join(directorio, nombre))
+            except OSError:
+                pass
+
+
+def _escribir_xlsx(reporte, ruta):
+    # Modo write-only: las filas se vuelcan a disco a medida que se agregan
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Asistencias')
+    ws.append(['Nombre', 'Instrumento', *reporte['fechas']])
+    for fila in reporte['registros']:
+        ws.append([fila['nombre'], fila['instrumento'], *(fila[f] for f in reporte['fechas'])])
+    wb.save(ruta)
+
+
+def _latin1(texto):
+    # Las fuentes estándar de PDF solo cubren latin-1
+    return (texto or '').encode('latin-1', 'replace').decode('latin-1')
+
+
+def _escribir_pdf(reporte, ruta, fechas_por_pagina=10):
+    pdf = FPDF(orientation='L', unit='mm', format='A4')
+    pdf.set_auto_page_break(auto=True, margin=10)
+    pdf.set_font('Helvetica', size=7)
+
+    fechas = reporte['fechas']
+    # Si hay muchas fechas, el reporte se parte en bloques de columnas
+    bloques = [fechas[i:i + fechas_por_pagina] for i in range(0, len(fechas), fechas_por_pagina)] or [[]]
+
+    for bloque in bloques:
+        pdf.add_page()
+        pdf.set_font('Helvetica', style='B', size=7)
+        encabezado = [('Nombre', 50), ('Instrumento', 30), *((f, 20) for f in bloque)]
+        for texto, ancho in encabezado:
+            pdf.cell(ancho, 6, _latin1(texto), border=1)
+        pdf.ln()
+
+        pdf.set_font('Helvetica', size=7)
+        for fila in reporte['registros']:
+            pdf.cell(50, 5, _latin1(fila['nombre']), border=1)
+            pdf.cell(30, 5, _latin1(fila['instrumento']), border=1)
+            for fecha in bloque:
+                pdf.cell(20, 5, _latin1(fila[fecha]), border=1)
+            pdf.ln()
+
+    pdf.output(ruta)
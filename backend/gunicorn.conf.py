@@ -0,0 +1,34 @@
+# gunicorn.conf.py
+# Configuración de gunicorn para producción. Se ajusta con variables de entorno.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Carga la app (imports, create_all, auto-migración y blueprints) una sola vez
+# en el proceso maestro antes de crear los workers
+preload_app = True
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers periódicamente para acotar fugas de memoria
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas por el maestro durante la precarga no se pueden
+    # compartir entre procesos: cada worker arranca con un pool nuevo
+    from wsgi import app
+    from extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
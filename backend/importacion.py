@@ -0,0 +1,96 @@
+# importacion.py
+"""Reporte de validación acotado para las importaciones CSV.
+
+Los errores se agrupan por código, con su cantidad y unos pocos ejemplos, en
+vez de devolver un mensaje por línea. Las filas rechazadas se guardan aparte
+en un CSV (con la línea y el motivo) que se puede descargar, corregir y
+volver a subir.
+"""
+import csv
+import os
+import re
+import uuid
+from collections import Counter
+
+from flask import current_app
+
+MAX_EJEMPLOS_POR_CODIGO = 5
+MAX_ERRORES_EN_RESPUESTA = 20
+MAX_ARCHIVOS_RECHAZOS = 100
+
+_ID_RECHAZOS = re.compile(r'^[a-z]+-\d+-[0-9a-f]{32}$')
+
+
+class ReporteValidacion:
+    def __init__(self, columnas):
+        self.columnas = [c for c in (columnas or []) if c]
+        self.conteos = Counter()
+        self.ejemplos = {}
+        self.rechazadas = []
+
+    def rechazar(self, codigo, linea, mensaje, row):
+        self.conteos[codigo] += 1
+        ejemplos = self.ejemplos.setdefault(codigo, [])
+        if len(ejemplos) < MAX_EJEMPLOS_POR_CODIGO:
+            ejemplos.append(mensaje)
+        self.rechazadas.append((linea, codigo, row))
+
+    @property
+    def total(self):
+        return sum(self.conteos.values())
+
+    def respuesta(self, creados, tipo, id_agrupacion):
+        """Cuerpo de respuesta de la importación; `errores` es solo una muestra."""
+        muestra = []
+        for codigo, _ in self.conteos.most_common():
+            muestra.extend(self.ejemplos[codigo])
+        return {
+            'creados': creados,
+            'errores': muestra[:MAX_ERRORES_EN_RESPUESTA],
+            'total_errores': self.total,
+            'resumen_errores': {
+                codigo: {'cantidad': cantidad, 'ejemplos': self.ejemplos[codigo]}
+                for codigo, cantidad in self.conteos.most_common()
+            },
+            'id_rechazos': self._guardar_rechazos(tipo, id_agrupacion) if self.rechazadas else None
+        }
+
+    def _guardar_rechazos(self, tipo, id_agrupacion):
+        directorio = _directorio()
+        id_rechazos = f'{tipo}-{id_agrupacion}-{uuid.uuid4().hex}'
+        with open(os.path.join(directorio, f'{id_rechazos}.csv'), 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['linea', *self.columnas, 'motivo'])
+            for linea, codigo, row in self.rechazadas:
+                writer.writerow([linea, *(row.get(c, '') for c in self.columnas), codigo])
+        _recortar(directorio)
+        return id_rechazos
+
+
+def ruta_rechazos(tipo, id_agrupacion, id_rechazos):
+    """Ruta del CSV de rechazos si existe y pertenece a ese tipo de importación y agrupación."""
+    if not _ID_RECHAZOS.match(id_rechazos) or not id_rechazos.startswith(f'{tipo}-{id_agrupacion}-'):
+        return None
+    ruta = os.path.join(_directorio(), f'{id_rechazos}.csv')
+    return ruta if os.path.exists(ruta) else None
+
+
+def _directorio():
+    directorio = current_app.config.setdefault(
+        'RECHAZOS_DIR', os.path.join(current_app.instance_path, 'rechazos')
+    )
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _recortar(directorio):
+    # Conserva solo los archivos de rechazos más recientes
+    archivos = sorted(
+        (os.path.join(directorio, n) for n in os.listdir(directorio) if n.endswith('.csv')),
+        key=os.path.getmtime
+    )
+    for ruta in archivos[:max(len(archivos) - MAX_ARCHIVOS_RECHAZOS, 0)]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,70 @@
+# lecturas.py
+"""Capa de lectura liviana para los listados.
+
+Las consultas son select() de SQLAlchemy Core que traen solo las columnas
+necesarias como tuplas, sin hidratar entidades del ORM; la serialización arma
+cada dict directamente desde la tupla. La usan tanto los blueprints de Flask
+como el servidor asíncrono (asgi.py).
+"""
+from sqlalchemy import select
+
+from models import Usuario, Evento, Asistencia, TipoAsistencia
+
+
+def consulta_usuarios(id_agrupacion):
+    return select(Usuario.id_usuario, Usuario.nombre, Usuario.instrumento)\
+        .where(Usuario.id_agrupacion == id_agrupacion)
+
+
+def serializar_usuarios(filas):
+    return [{
+        'id_usuario': id_usuario,
+        'nombre': nombre,
+        'instrumento': instrumento
+    } for id_usuario, nombre, instrumento in filas]
+
+
+def consulta_eventos(id_agrupacion):
+    return select(Evento.id_evento, Evento.fecha)\
+        .where(Evento.id_agrupacion == id_agrupacion)
+
+
+def serializar_eventos(filas):
+    return [{
+        'id_evento': id_evento,
+        'fecha': fecha.isoformat()
+    } for id_evento, fecha in filas]
+
+
+def consulta_asistencias(id_agrupacion, evento_model=Evento, asistencia_model=Asistencia, filtros=()):
+    """Listado de asistencias; con EventoArchivo/AsistenciaArchivo lee las temporadas
+    archivadas. `filtros` son condiciones extra, como en reportes.consultas_reporte."""
+    return select(asistencia_model.id_usuario, asistencia_model.id_evento, asistencia_model.id_tipo,
+                  Usuario.nombre, Usuario.instrumento, evento_model.fecha, TipoAsistencia.descripcion)\
+        .join(Usuario, asistencia_model.id_usuario == Usuario.id_usuario)\
+        .join(evento_model, asistencia_model.id_evento == evento_model.id_evento)\
+        .join(TipoAsistencia, asistencia_model.id_tipo == TipoAsistencia.id_tipo)\
+        .where(asistencia_model.id_agrupacion == id_agrupacion, *filtros)
+
+
+def serializar_asistencias(filas):
+    return [{
+        'id_usuario': id_usuario,
+        'id_evento': id_evento,
+        'id_tipo': id_tipo,
+        'usuario': nombre,
+        'instrumento': instrumento,
+        'fecha': fecha.isoformat(),
+        'estado': estado
+    } for id_usuario, id_evento, id_tipo, nombre, instrumento, fecha, estado in filas]
+
+
+def consulta_tipos():
+    return select(TipoAsistencia.id_tipo, TipoAsistencia.descripcion)
+
+
+def serializar_tipos(filas):
+    return [{
+        'id_tipo': id_tipo,
+        'descripcion': descripcion
+    } for id_tipo, descripcion in filas]
@@ -0,0 +1,269 @@
+"""
+Generador de carga contra una instancia en ejecución.
+
+Simula el tráfico de un ensayo: jefes de fila pasando lista mientras los
+integrantes consultan listas y el reporte, con algún login (y, si se pide,
+alguna importación) de vez en cuando. Cada worker (thread) elige operaciones según la mezcla
+configurada hasta que se acaba el tiempo. Al final informa throughput,
+percentiles de latencia, tasa de errores (de las peticiones y de cada
+operación dentro de los lotes de pase de lista) y fallas por bloqueo de la base.
+
+Ojo: pase_lista e importar escriben de verdad en la instancia. importar deja
+eventos y asistencias permanentes en fechas al azar entre 2000 y 2010, por eso
+no está en la mezcla por defecto y hay que pedirlo explícitamente.
+
+Uso:
+    python loadgen.py --url http://localhost:5000/api --usuario admin --password secreto \\
+        --workers 50 --duracion 60 --mezcla login=1,pase_lista=15,listas=30,reporte=50,importar=1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+MEZCLA_POR_DEFECTO = 'login=1,pase_lista=15,listas=30,reporte=50'
+
+# Indicios de que la falla se debió a contención de bloqueos en la base
+INDICIOS_BLOQUEO = ('lock', 'deadlock', 'database is locked', 'could not serialize', 'timeout')
+
+
+class Cliente:
+    def __init__(self, url, timeout):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def pedir(self, metodo, ruta, json_body=None, archivo=None):
+        """Devuelve (status, cuerpo). status es None si no hubo respuesta."""
+        headers = {}
+        datos = None
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if json_body is not None:
+            datos = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif archivo is not None:
+            limite = uuid.uuid4().hex
+            datos = (
+                f'--{limite}\r\nContent-Disposition: form-data; name="file"; filename="carga.csv"\r\n'
+                f'Content-Type: text/csv\r\n\r\n'
+            ).encode('utf-8') + archivo + f'\r\n--{limite}--\r\n'.encode('utf-8')
+            headers['Content-Type'] = f'multipart/form-data; boundary={limite}'
+
+        req = urllib.request.Request(self.url + ruta, data=datos, headers=headers, method=metodo)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            return None, str(e).encode('utf-8')
+
+
+class Escenario:
+    """Operaciones del ensayo.
+
+    Cada una devuelve (status, cuerpo, estados_por_operacion); la última lista
+    solo tiene datos en los lotes de mutaciones, donde la respuesta HTTP es 200
+    aunque alguna operación del lote haya fallado.
+    """
+
+    def __init__(self, cliente, credenciales, usuarios, nombres, eventos, tipos, existentes):
+        self.cliente = cliente
+        self.credenciales = credenciales
+        self.usuarios = usuarios
+        self.nombres = nombres
+        self.eventos = eventos
+        self.tipos = tipos
+        # Pares (id_usuario, id_evento) con asistencia registrada: solo a esos se les manda 'update'
+        self.existentes = existentes
+        self._lock = threading.Lock()
+
+    def login(self):
+        return (*self.cliente.pedir('POST', '/auth/login', self.credenciales), [])
+
+    def pase_lista(self):
+        # Un jefe de fila sincroniza la asistencia de su fila en un solo lote
+        id_evento = random.choice(self.eventos)
+        fila = random.sample(self.usuarios, min(8, len(self.usuarios)))
+        with self._lock:
+            operaciones = [{
+                'clave': uuid.uuid4().hex,
+                'op': 'update' if (id_usuario, id_evento) in self.existentes else 'create',
+                'id_usuario': id_usuario,
+                'id_evento': id_evento,
+                'id_tipo': random.choice(self.tipos)
+            } for id_usuario in fila]
+        status, cuerpo = self.cliente.pedir('POST', '/asistencias/mutations', {'operaciones': operaciones})
+        if status != 200:
+            return status, cuerpo, []
+
+        resultados = json.loads(cuerpo).get('resultados', [])
+        with self._lock:
+            for r in resultados:
+                # 409 en un create: otro jefe de fila lo creó primero, el par ya existe
+                if r['op'] == 'create' and r['status'] in (201, 409):
+                    self.existentes.add((r['id_usuario'], r['id_evento']))
+        return status, cuerpo, [r['status'] for r in resultados]
+
+    def listas(self):
+        return (*self.cliente.pedir('GET', random.choice(('/usuarios', '/eventos', '/asistencias'))), [])
+
+    def reporte(self):
+        return (*self.cliente.pedir('GET', '/asistencias/reporte-por-fecha'), [])
+
+    def importar(self, filas=200):
+        """Importa un CSV en una fecha al azar de 2000-2010. Los datos quedan en la instancia."""
+        dia = date(2000, 1, 1) + timedelta(days=random.randint(0, 3650))
+        lineas = ['fecha,usuario,estado'] + [
+            f'{dia.isoformat()},{random.choice(self.nombres)},{random.choice(("asistio", "falta", "permiso"))}'
+            for _ in range(filas)
+        ]
+        return (*self.cliente.pedir('POST', '/asistencias/import', archivo='\n'.join(lineas).encode('utf-8')), [])
+
+
+def _parse_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in ('login', 'pase_lista', 'listas', 'reporte', 'importar'):
+            raise SystemExit(f'Operación desconocida en --mezcla: {nombre}')
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def _es_bloqueo(status, cuerpo):
+    if status in (409, 423, 503, 504):
+        return True
+    if status is not None and status >= 500:
+        texto = cuerpo.decode('utf-8', 'replace').lower()
+        return any(indicio in texto for indicio in INDICIOS_BLOQUEO)
+    return False
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    k = (len(valores) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(valores) - 1)
+    return valores[f] + (valores[c] - valores[f]) * (k - f)
+
+
+def preparar(args):
+    cliente = Cliente(args.url, args.timeout)
+    credenciales = {'username': args.usuario, 'password': args.password}
+    status, cuerpo = cliente.pedir('POST', '/auth/login', credenciales)
+    if status != 200:
+        raise SystemExit(f'No se pudo iniciar sesión ({status}): {cuerpo[:200]!r}')
+    cliente.token = json.loads(cuerpo)['access_token']
+
+    usuarios = json.loads(cliente.pedir('GET', '/usuarios')[1])
+    eventos = json.loads(cliente.pedir('GET', '/eventos')[1])
+    tipos = json.loads(cliente.pedir('GET', '/asistencias/tipos')[1])
+    asistencias = json.loads(cliente.pedir('GET', '/asistencias')[1])
+    if not usuarios or not eventos or not tipos:
+        raise SystemExit('La instancia necesita usuarios, eventos y tipos de asistencia cargados')
+
+    return Escenario(cliente, credenciales,
+                     [u['id_usuario'] for u in usuarios],
+                     [u['nombre'] for u in usuarios],
+                     [e['id_evento'] for e in eventos],
+                     [t['id_tipo'] for t in tipos],
+                     {(a['id_usuario'], a['id_evento']) for a in asistencias})
+
+
+def ejecutar(escenario, mezcla, workers, duracion):
+    nombres = list(mezcla)
+    pesos = [mezcla[n] for n in nombres]
+    fin = time.monotonic() + duracion
+    lock = threading.Lock()
+    latencias = defaultdict(list)
+    errores = defaultdict(int)
+    bloqueos = defaultdict(int)
+    sin_respuesta = defaultdict(int)
+    # Operaciones dentro de los lotes de mutaciones y cuántas fallaron
+    ops = defaultdict(int)
+    ops_fallidas = defaultdict(int)
+
+    def worker():
+        while time.monotonic() < fin:
+            nombre = random.choices(nombres, pesos)[0]
+            inicio = time.perf_counter()
+            status, cuerpo, estados = getattr(escenario, nombre)()
+            transcurrido = (time.perf_counter() - inicio) * 1000
+            with lock:
+                latencias[nombre].append(transcurrido)
+                ops[nombre] += len(estados)
+                ops_fallidas[nombre] += sum(1 for e in estados if e >= 400)
+                if status is None:
+                    sin_respuesta[nombre] += 1
+                elif status >= 400:
+                    errores[nombre] += 1
+                    if _es_bloqueo(status, cuerpo):
+                        bloqueos[nombre] += 1
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(worker) for _ in range(workers)]
+    # Un worker que lanzó una excepción dejó de generar carga: hay que avisarlo
+    fallas_workers = [repr(f.exception()) for f in futuros if f.exception() is not None]
+    return (time.monotonic() - inicio, latencias, errores, bloqueos, sin_respuesta,
+            ops, ops_fallidas, fallas_workers)
+
+
+def informar(transcurrido, latencias, errores, bloqueos, sin_respuesta, ops, ops_fallidas, fallas_workers):
+    print(f"\n{'OPERACIÓN':<12} {'PET.':>7} {'REQ/S':>8} {'P50 ms':>8} {'P90 ms':>8} {'P99 ms':>8} "
+          f"{'MÁX ms':>8} {'ERR %':>6} {'BLOQ.':>6} {'S/RESP':>6} {'OPS':>7} {'ERR OP %':>8}")
+    print('-' * 110)
+    total = total_errores = 0
+    for nombre in sorted(latencias):
+        valores = sorted(latencias[nombre])
+        n = len(valores)
+        fallas = errores[nombre] + sin_respuesta[nombre]
+        total += n
+        total_errores += fallas
+        err_op = f'{100 * ops_fallidas[nombre] / ops[nombre]:>8.1f}' if ops[nombre] else f"{'-':>8}"
+        print(f'{nombre:<12} {n:>7} {n / transcurrido:>8.1f} {_percentil(valores, 50):>8.1f} '
+              f'{_percentil(valores, 90):>8.1f} {_percentil(valores, 99):>8.1f} {valores[-1]:>8.1f} '
+              f'{100 * fallas / n:>6.1f} {bloqueos[nombre]:>6} {sin_respuesta[nombre]:>6} '
+              f'{ops[nombre]:>7} {err_op}')
+    print('-' * 110)
+    print(f'Total: {total} peticiones en {transcurrido:.1f}s ({total / transcurrido:.1f} req/s), '
+          f'{total_errores} con error, {sum(bloqueos.values())} por bloqueo, '
+          f'{sum(ops_fallidas.values())} de {sum(ops.values())} operaciones de lote con error')
+    if fallas_workers:
+        print(f'⚠ {len(fallas_workers)} worker(s) terminaron con una excepción:')
+        for falla in sorted(set(fallas_workers)):
+            print(f'  - {falla}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de carga para sistema-asistencias')
+    parser.add_argument('--url', default='http://localhost:5000/api')
+    parser.add_argument('--usuario', required=True, help='Usuario admin para iniciar sesión')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--workers', type=int, default=20, help='Clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de carga')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout por petición (s)')
+    parser.add_argument('--mezcla', default=MEZCLA_POR_DEFECTO,
+                        help=f'Pesos por operación (por defecto: {MEZCLA_POR_DEFECTO})')
+    args = parser.parse_args()
+
+    mezcla = _parse_mezcla(args.mezcla)
+    escenario = preparar(args)
+    print(f'Ejecutando {args.workers} workers durante {args.duracion:.0f}s contra {args.url} ...')
+    informar(*ejecutar(escenario, mezcla, args.workers, args.duracion))
+
+
+if __name__ == '__main__':
+    main()
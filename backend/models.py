@@ -1,19 +1,39 @@
 # models.py
 from extensions import db
 
+class Agrupacion(db.Model):
+    __tablename__ = 'agrupacion'
+    id_agrupacion = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False, unique=True)
+
 class Usuario(db.Model):
     __tablename__ = 'usuario'
     id_usuario = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(100), nullable=False, unique=True)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False, server_default='1')
+    nombre = db.Column(db.String(100), nullable=False)
     instrumento = db.Column(db.String(100))
     email = db.Column(db.String(120))
     telefono = db.Column(db.String(30))
 
+    # El nombre es único dentro de cada agrupación
+    __table_args__ = (
+        db.UniqueConstraint('id_agrupacion', 'nombre', name='uq_usuario_agrupacion_nombre'),
+    )
+
 class Evento(db.Model):
     __tablename__ = 'evento'
     id_evento = db.Column(db.Integer, primary_key=True)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False, server_default='1')
     fecha = db.Column(db.Date, nullable=False)
 
+    __table_args__ = (
+        # Un solo evento por fecha en cada agrupación
+        db.Index('uq_evento_agrupacion_fecha', 'id_agrupacion', 'fecha', unique=True),
+        # En SQLite, sin AUTOINCREMENT se reutilizarían los ids de eventos
+        # archivados y la temporada no se podría restaurar
+        {'sqlite_autoincrement': True},
+    )
+
 class TipoAsistencia(db.Model):
     __tablename__ = 'tipo_asistencia'
     id_tipo = db.Column(db.Integer, primary_key=True)
@@ -24,11 +44,81 @@ class Asistencia(db.Model):
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id_usuario'), primary_key=True)
     id_evento = db.Column(db.Integer, db.ForeignKey('evento.id_evento'), primary_key=True)
     id_tipo = db.Column(db.Integer, db.ForeignKey('tipo_asistencia.id_tipo'), nullable=False)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False, server_default='1')
+
+    __table_args__ = (
+        db.Index('ix_asistencia_agrupacion_evento', 'id_agrupacion', 'id_evento'),
+        db.Index('ix_asistencia_agrupacion_usuario', 'id_agrupacion', 'id_usuario'),
+    )
 
 class Admin(db.Model):
     __tablename__ = 'admin'
     id_admin = db.Column(db.Integer, primary_key=True)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False, server_default='1', index=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     nombre_completo = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=db.func.now())
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=db.func.now())
+
+class Temporada(db.Model):
+    __tablename__ = 'temporada'
+    id_temporada = db.Column(db.Integer, primary_key=True)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False, server_default='1')
+    nombre = db.Column(db.String(100), nullable=False)
+    fecha_inicio = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date, nullable=False)
+    archivada = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('id_agrupacion', 'nombre', name='uq_temporada_agrupacion_nombre'),
+    )
+
+# Tablas de archivo: mismas columnas que las tablas "calientes" más la temporada.
+# Conservan los ids originales para poder restaurar sin reescribir referencias.
+class EventoArchivo(db.Model):
+    __tablename__ = 'evento_archivo'
+    id_evento = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    id_temporada = db.Column(db.Integer, db.ForeignKey('temporada.id_temporada'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_evento_archivo_agrupacion_temporada', 'id_agrupacion', 'id_temporada'),
+    )
+
+class AsistenciaArchivo(db.Model):
+    __tablename__ = 'asistencia_archivo'
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id_usuario'), primary_key=True)
+    id_evento = db.Column(db.Integer, db.ForeignKey('evento_archivo.id_evento'), primary_key=True)
+    id_tipo = db.Column(db.Integer, db.ForeignKey('tipo_asistencia.id_tipo'), nullable=False)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False)
+    id_temporada = db.Column(db.Integer, db.ForeignKey('temporada.id_temporada'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_asistencia_archivo_agrupacion_temporada', 'id_agrupacion', 'id_temporada'),
+    )
+
+class VersionDatos(db.Model):
+    """Contador por agrupación que se incrementa con cada cambio en sus datos.
+
+    Lo usan los exportes para saber si un archivo generado sigue vigente.
+    """
+    __tablename__ = 'version_datos'
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ClaveIdempotencia(db.Model):
+    """Resultado ya aplicado de una operación enviada con una clave de idempotencia.
+
+    Se conservan solo las claves más recientes de cada agrupación.
+    """
+    __tablename__ = 'clave_idempotencia'
+    id = db.Column(db.Integer, primary_key=True)
+    id_agrupacion = db.Column(db.Integer, db.ForeignKey('agrupacion.id_agrupacion'), nullable=False)
+    clave = db.Column(db.String(100), nullable=False)
+    resultado = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('id_agrupacion', 'clave', name='uq_clave_idempotencia_agrupacion_clave'),
+    )
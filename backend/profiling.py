@@ -0,0 +1,171 @@
+# profiling.py
+"""Perfilado opcional de peticiones.
+
+Una petición se perfila si un admin autenticado envía la cabecera
+`X-Profile: 1`, o al azar según PROFILE_SAMPLE_RATE (0 a 1). Se usa
+pyinstrument (muestreo) si está instalado y cProfile si no. Cada perfil se
+guarda junto a un log de sus consultas SQL en un anillo acotado en disco.
+"""
+import cProfile
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+from flask import g, request, has_request_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    from pyinstrument import Profiler as _SamplingProfiler
+except ImportError:
+    _SamplingProfiler = None
+
+CABECERA_PERFIL = 'X-Profile'
+
+
+def init_app(app):
+    app.config.setdefault('PROFILE_SAMPLE_RATE', float(os.getenv('PROFILE_SAMPLE_RATE', '0')))
+    app.config.setdefault('PROFILE_MAX_FILES', int(os.getenv('PROFILE_MAX_FILES', '50')))
+    app.config.setdefault('PROFILES_DIR', os.path.join(app.instance_path, 'profiles'))
+    os.makedirs(app.config['PROFILES_DIR'], exist_ok=True)
+
+    @app.before_request
+    def iniciar_perfil():
+        if request.blueprint == 'debug' or not _debe_perfilar(app):
+            return
+        if _SamplingProfiler is not None:
+            profiler = _SamplingProfiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Ya hay otro perfilador activo en el proceso
+                return
+        g._perfil = {'profiler': profiler, 'consultas': [], 'inicio': time.perf_counter()}
+
+    @app.after_request
+    def guardar_perfil(response):
+        perfil = g.pop('_perfil', None)
+        if perfil is not None:
+            _guardar(app, perfil, response)
+        return response
+
+
+def _debe_perfilar(app):
+    if request.headers.get(CABECERA_PERFIL) == '1':
+        try:
+            verify_jwt_in_request(optional=True)
+            if get_jwt_identity() is not None:
+                return True
+        except Exception:
+            return False
+    tasa = app.config['PROFILE_SAMPLE_RATE']
+    return tasa > 0 and random.random() < tasa
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('_perfil') is not None:
+        conn.info.setdefault('_perfil_inicio', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('_perfil') is not None:
+        pila = conn.info.get('_perfil_inicio')
+        if pila:
+            duracion = time.perf_counter() - pila.pop()
+            g._perfil['consultas'].append({
+                'sql': statement,
+                'duracion_ms': round(duracion * 1000, 3),
+                'executemany': executemany
+            })
+
+
+def _guardar(app, perfil, response):
+    profiler = perfil['profiler']
+    duracion = time.perf_counter() - perfil['inicio']
+    directorio = app.config['PROFILES_DIR']
+
+    ruta_slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_')[:60]
+    base = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{request.method}-{ruta_slug}"
+
+    if _SamplingProfiler is not None:
+        profiler.stop()
+        archivo = f'{base}.html'
+        with open(os.path.join(directorio, archivo), 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        archivo = f'{base}.prof'
+        profiler.dump_stats(os.path.join(directorio, archivo))
+
+    with open(os.path.join(directorio, f'{base}.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'id': base,
+            'id_agrupacion': _agrupacion_de_peticion(),
+            'metodo': request.method,
+            'ruta': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'duracion_ms': round(duracion * 1000, 3),
+            'archivo': archivo,
+            'consultas': perfil['consultas']
+        }, f, ensure_ascii=False)
+
+    _recortar_anillo(directorio, app.config['PROFILE_MAX_FILES'])
+
+
+def _agrupacion_de_peticion():
+    # La ruta ya la resolvió si tocó datos; si no, se toma del token (puede no haberlo)
+    if 'id_agrupacion' in g:
+        return g.id_agrupacion
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt().get('id_agrupacion')
+    except Exception:
+        return None
+
+
+def _recortar_anillo(directorio, maximo):
+    # Los nombres empiezan con la fecha, así que el orden alfabético es cronológico
+    metadatos = sorted(n for n in os.listdir(directorio) if n.endswith('.json'))
+    for nombre in metadatos[:max(len(metadatos) - maximo, 0)]:
+        base = nombre[:-len('.json')]
+        for extension in ('.json', '.prof', '.html'):
+            try:
+                os.remove(os.path.join(directorio, base + extension))
+            except OSError:
+                pass
+
+
+def leer_metadatos(directorio, id):
+    """Metadatos (con el log de consultas) del perfil `id`, o None si ya no existe."""
+    try:
+        with open(os.path.join(directorio, id + '.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Pudo haber sido eliminado por el anillo
+        return None
+
+
+def listar_perfiles(directorio, id_agrupacion):
+    """Perfiles de la agrupación, del más nuevo al más viejo.
+
+    Los que no se pudieron asociar a una agrupación (peticiones sin token) no se listan.
+    """
+    perfiles = []
+    for nombre in sorted((n for n in os.listdir(directorio) if n.endswith('.json')), reverse=True):
+        datos = leer_metadatos(directorio, nombre[:-len('.json')])
+        if datos is None or datos.get('id_agrupacion') != id_agrupacion:
+            continue
+        consultas = datos.pop('consultas', [])
+        datos['num_consultas'] = len(consultas)
+        datos['tiempo_sql_ms'] = round(sum(c['duracion_ms'] for c in consultas), 3)
+        perfiles.append(datos)
+    return perfiles
@@ -0,0 +1,56 @@
+# reportes.py
+from sqlalchemy import select
+
+from extensions import db
+from models import Usuario, Evento, Asistencia, TipoAsistencia
+
+
+def consultas_reporte(id_agrupacion, evento_model=Evento, asistencia_model=Asistencia, filtros=()):
+    """Devuelve las dos consultas (usuarios, asistencias) en que se basa el reporte.
+
+    Sirven tanto para las tablas actuales como para las de archivo
+    (EventoArchivo/AsistenciaArchivo); `filtros` son condiciones extra sobre
+    `evento_model`. Se comparten entre la app Flask y el servidor asíncrono.
+    """
+    usuarios = select(Usuario.id_usuario, Usuario.nombre, Usuario.instrumento)\
+        .where(Usuario.id_agrupacion == id_agrupacion)
+
+    asistencias = select(asistencia_model.id_usuario, evento_model.fecha, TipoAsistencia.descripcion)\
+        .join(evento_model, asistencia_model.id_evento == evento_model.id_evento)\
+        .join(TipoAsistencia, asistencia_model.id_tipo == TipoAsistencia.id_tipo)\
+        .where(asistencia_model.id_agrupacion == id_agrupacion, *filtros)
+
+    return usuarios, asistencias
+
+
+def armar_reporte(usuarios, asistencias):
+    """Arma la matriz usuario x fecha a partir de las filas de `consultas_reporte`."""
+    # Solo las fechas que tienen al menos un registro de asistencia
+    por_usuario = {}
+    fechas = set()
+    for id_usuario, fecha, estado in asistencias:
+        fecha_iso = fecha.isoformat()
+        fechas.add(fecha_iso)
+        por_usuario.setdefault(id_usuario, {})[fecha_iso] = estado
+    fechas_list = sorted(fechas)
+
+    # Rellenar con "No convocado" si no hay registro para esa fecha
+    reporte = []
+    for id_usuario, nombre, instrumento in usuarios:
+        asist_dict = por_usuario.get(id_usuario, {})
+        reporte.append({
+            'nombre': nombre,
+            'instrumento': instrumento,
+            **{fecha: asist_dict.get(fecha, 'No convocado') for fecha in fechas_list}
+        })
+
+    return {
+        'fechas': fechas_list,
+        'registros': reporte
+    }
+
+
+def construir_reporte(id_agrupacion, evento_model=Evento, asistencia_model=Asistencia, filtros=()):
+    """Reporte de asistencias por fecha. Usa dos consultas en total, sin importar cuántos usuarios haya."""
+    usuarios, asistencias = consultas_reporte(id_agrupacion, evento_model, asistencia_model, filtros)
+    return armar_reporte(db.session.execute(usuarios).all(), db.session.execute(asistencias).all())
@@ -1,34 +1,55 @@
-from flask import Blueprint, request, jsonify
-from models import Asistencia, Usuario, Evento, TipoAsistencia
+from flask import Blueprint, request, jsonify, current_app, send_file
+from models import Asistencia, Usuario, Evento, TipoAsistencia, ClaveIdempotencia
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError, OperationalError
 from extensions import db
+from tenancy import get_agrupacion_id
+from reportes import construir_reporte
+from routes.eventos import obtener_o_crear_eventos, FechasArchivadas
+import exportes
+import columnar
+import lecturas
+from importacion import ReporteValidacion, ruta_rechazos
 from datetime import datetime
 import csv
+import json
+import tempfile
 
 asistencias_bp = Blueprint('asistencias', __name__)
 
+# Límites del endpoint de mutaciones en lote
+MAX_OPERACIONES_POR_LOTE = 500
+MAX_CLAVES_IDEMPOTENCIA = 10000
+
+# Map common variations to database values (importaciones CSV)
+ESTADO_MAPPINGS = {
+    'falta': 'No asistió',
+    'permiso': 'Con permiso',
+    'asistió': 'Asistió',
+    'asistio': 'Asistió',
+    'no convocado': 'No convocado',
+    'no asistió': 'No asistió',
+    'no asistio': 'No asistió',
+    'con permiso': 'Con permiso'
+}
+
 # GET /api/asistencias
 @asistencias_bp.route('', methods=['GET'])
 def get_asistencias():
-    asistencias = db.session.query(Asistencia, Usuario, Evento, TipoAsistencia)\
-        .join(Usuario, Asistencia.id_usuario == Usuario.id_usuario)\
-        .join(Evento, Asistencia.id_evento == Evento.id_evento)\
-        .join(TipoAsistencia, Asistencia.id_tipo == TipoAsistencia.id_tipo)\
-        .all()
-    
-    return jsonify([{
-        'id_usuario': a.id_usuario,
-        'id_evento': a.id_evento,
-        'id_tipo': a.id_tipo,
-        'usuario': u.nombre,
-        'instrumento': u.instrumento,
-        'fecha': e.fecha.isoformat(),
-        'estado': t.descripcion
-    } for a, u, e, t in asistencias])
+    filas = db.session.execute(lecturas.consulta_asistencias(get_agrupacion_id()))
+    return jsonify(lecturas.serializar_asistencias(filas))
 
 # POST /api/asistencias
 @asistencias_bp.route('', methods=['POST'])
 def create_asistencia():
     data = request.get_json()
+    id_agrupacion = get_agrupacion_id()
+    
+    # El usuario y el evento deben pertenecer a la agrupación del token
+    usuario = Usuario.query.filter_by(id_usuario=data['id_usuario'], id_agrupacion=id_agrupacion).first()
+    evento = Evento.query.filter_by(id_evento=data['id_evento'], id_agrupacion=id_agrupacion).first()
+    if not usuario or not evento:
+        return jsonify({'error': 'Usuario o evento no encontrado'}), 404
     
     # Verificar si ya existe un registro para este usuario en este evento
     asistencia_existente = Asistencia.query.filter_by(
@@ -42,7 +63,8 @@ def create_asistencia():
     nueva = Asistencia(
         id_usuario=data['id_usuario'],
         id_evento=data['id_evento'],
-        id_tipo=data['id_tipo']
+        id_tipo=data['id_tipo'],
+        id_agrupacion=id_agrupacion
     )
     try:
         db.session.add(nueva)
@@ -59,7 +81,9 @@ def create_asistencia():
 # PUT /api/asistencias/<int:id_usuario>/<int:id_evento>
 @asistencias_bp.route('/<int:id_usuario>/<int:id_evento>', methods=['PUT'])
 def update_asistencia(id_usuario, id_evento):
-    asistencia = Asistencia.query.get_or_404((id_usuario, id_evento))
+    asistencia = Asistencia.query.filter_by(
+        id_usuario=id_usuario, id_evento=id_evento, id_agrupacion=get_agrupacion_id()
+    ).first_or_404()
     data = request.get_json()
     asistencia.id_tipo = data['id_tipo']
     try:
@@ -76,58 +100,222 @@ def update_asistencia(id_usuario, id_evento):
 # DELETE /api/asistencias/<int:id_usuario>/<int:id_evento>
 @asistencias_bp.route('/<int:id_usuario>/<int:id_evento>', methods=['DELETE'])
 def delete_asistencia(id_usuario, id_evento):
-    asistencia = Asistencia.query.get_or_404((id_usuario, id_evento))
+    asistencia = Asistencia.query.filter_by(
+        id_usuario=id_usuario, id_evento=id_evento, id_agrupacion=get_agrupacion_id()
+    ).first_or_404()
     db.session.delete(asistencia)
     db.session.commit()
     return '', 204
 
 
+# POST /api/asistencias/mutations - Lote ordenado de altas/cambios/bajas
+@asistencias_bp.route('/mutations', methods=['POST'])
+def aplicar_mutaciones():
+    """Aplica un lote de operaciones sobre asistencias en una sola transacción.
+
+    Cuerpo: {"operaciones": [{"clave", "op": "create"|"update"|"delete",
+    "id_usuario", "id_evento", "id_tipo"}]}. Cada operación lleva una clave de
+    idempotencia generada por el cliente; si la clave ya se aplicó, se
+    devuelve el resultado guardado sin volver a aplicarla, así que reenviar
+    un lote completo es seguro.
+    """
+    data = request.get_json(silent=True) or {}
+    operaciones = data.get('operaciones')
+    id_agrupacion = get_agrupacion_id()
+
+    if not isinstance(operaciones, list) or not operaciones:
+        return jsonify({'error': 'Se requiere una lista de operaciones'}), 400
+    if len(operaciones) > MAX_OPERACIONES_POR_LOTE:
+        return jsonify({'error': f'Máximo {MAX_OPERACIONES_POR_LOTE} operaciones por lote'}), 400
+
+    def es_id(valor):
+        # bool es subclase de int: True/False no son ids válidos
+        return isinstance(valor, int) and not isinstance(valor, bool)
+
+    for idx, op in enumerate(operaciones):
+        if not isinstance(op, dict) or not isinstance(op.get('clave'), str) or not op['clave'].strip() \
+                or len(op['clave']) > 100 or op.get('op') not in ('create', 'update', 'delete') \
+                or not es_id(op.get('id_usuario')) or not es_id(op.get('id_evento')) \
+                or (op['op'] != 'delete' and not es_id(op.get('id_tipo'))):
+            return jsonify({'error': f'Operación {idx} inválida'}), 400
+
+    claves = {op['clave'] for op in operaciones}
+    ids_usuarios = {op['id_usuario'] for op in operaciones}
+    ids_eventos = {op['id_evento'] for op in operaciones}
+
+    # Pre-carga en pocas consultas de todo lo que el lote necesita validar
+    aplicadas = {
+        clave: json.loads(resultado)
+        for clave, resultado in db.session.execute(
+            select(ClaveIdempotencia.clave, ClaveIdempotencia.resultado)
+            .where(ClaveIdempotencia.id_agrupacion == id_agrupacion, ClaveIdempotencia.clave.in_(claves))
+        )
+    }
+    usuarios_validos = set(db.session.scalars(
+        select(Usuario.id_usuario).where(Usuario.id_agrupacion == id_agrupacion, Usuario.id_usuario.in_(ids_usuarios))
+    ))
+    eventos_validos = set(db.session.scalars(
+        select(Evento.id_evento).where(Evento.id_agrupacion == id_agrupacion, Evento.id_evento.in_(ids_eventos))
+    ))
+    tipos_validos = set(db.session.scalars(select(TipoAsistencia.id_tipo)))
+    existentes = set(db.session.execute(
+        select(Asistencia.id_usuario, Asistencia.id_evento).where(
+            Asistencia.id_agrupacion == id_agrupacion,
+            Asistencia.id_usuario.in_(ids_usuarios),
+            Asistencia.id_evento.in_(ids_eventos)
+        )
+    ).tuples())
+
+    resultados = []
+    nuevas_claves = []
+    try:
+        for op in operaciones:
+            clave = op['clave']
+            if clave in aplicadas:
+                resultados.append({**aplicadas[clave], 'repetida': True})
+                continue
+
+            key = (op['id_usuario'], op['id_evento'])
+            resultado = {'clave': clave, 'op': op['op'], 'id_usuario': key[0], 'id_evento': key[1]}
+
+            if key[0] not in usuarios_validos or key[1] not in eventos_validos:
+                resultado.update(status=404, error='Usuario o evento no encontrado')
+            elif op['op'] != 'delete' and op['id_tipo'] not in tipos_validos:
+                resultado.update(status=400, error='Tipo de asistencia no válido')
+            elif op['op'] == 'create':
+                if key in existentes:
+                    resultado.update(status=409, error='Ya existe un registro de asistencia para este usuario en esta fecha')
+                else:
+                    db.session.execute(insert(Asistencia).values(
+                        id_usuario=key[0], id_evento=key[1], id_tipo=op['id_tipo'], id_agrupacion=id_agrupacion
+                    ))
+                    existentes.add(key)
+                    resultado.update(status=201, id_tipo=op['id_tipo'])
+            elif key not in existentes:
+                resultado.update(status=404, error='Registro de asistencia no encontrado')
+            elif op['op'] == 'update':
+                db.session.execute(
+                    update(Asistencia)
+                    .where(Asistencia.id_usuario == key[0], Asistencia.id_evento == key[1])
+                    .values(id_tipo=op['id_tipo']),
+                    execution_options={'synchronize_session': False}
+                )
+                resultado.update(status=200, id_tipo=op['id_tipo'])
+            else:
+                db.session.execute(
+                    delete(Asistencia)
+                    .where(Asistencia.id_usuario == key[0], Asistencia.id_evento == key[1]),
+                    execution_options={'synchronize_session': False}
+                )
+                existentes.discard(key)
+                resultado.update(status=204)
+
+            # Una clave repetida dentro del mismo lote también se aplica una sola vez
+            aplicadas[clave] = resultado
+            nuevas_claves.append({
+                'id_agrupacion': id_agrupacion,
+                'clave': clave,
+                'resultado': json.dumps(resultado, ensure_ascii=False)
+            })
+            resultados.append(resultado)
+
+        if nuevas_claves:
+            db.session.execute(insert(ClaveIdempotencia), nuevas_claves)
+            _recortar_claves_idempotencia(id_agrupacion)
+        db.session.commit()
+    except (IntegrityError, OperationalError) as e:
+        db.session.rollback()
+        # Otro dispositivo aplicó las mismas claves (o las mismas filas) al mismo tiempo,
+        # o la base estaba bloqueada: nada quedó aplicado y reintentar es seguro
+        return jsonify({'error': 'Error al aplicar el lote, puede reintentarse', 'details': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al aplicar el lote: {str(e)}'}), 500
+
+    return jsonify({'resultados': resultados}), 200
+
+
+def _recortar_claves_idempotencia(id_agrupacion):
+    # Conserva solo las MAX_CLAVES_IDEMPOTENCIA claves más recientes de la agrupación
+    limite = select(ClaveIdempotencia.id)\
+        .where(ClaveIdempotencia.id_agrupacion == id_agrupacion)\
+        .order_by(ClaveIdempotencia.id.desc())\
+        .offset(MAX_CLAVES_IDEMPOTENCIA)\
+        .limit(1)\
+        .scalar_subquery()
+    db.session.execute(
+        delete(ClaveIdempotencia)
+        .where(ClaveIdempotencia.id_agrupacion == id_agrupacion, ClaveIdempotencia.id <= limite),
+        execution_options={'synchronize_session': False}
+    )
+
 # Reporte de asistencias por fecha
 @asistencias_bp.route('/reporte-por-fecha')
 def reporte_por_fecha():
-    # Obtener solo las fechas que tienen al menos un registro de asistencia
-    fechas = db.session.query(Evento.fecha)\
-        .join(Asistencia, Evento.id_evento == Asistencia.id_evento)\
-        .distinct()\
-        .order_by(Evento.fecha)\
-        .all()
-    fechas_list = [f.fecha.isoformat() for f in fechas]
-
-    # Obtener todos los usuarios
-    usuarios = Usuario.query.all()
-
-    # Construir el reporte
-    reporte = []
-    for usuario in usuarios:
-        # Obtener asistencias del usuario
-        asistencias = db.session.query(Asistencia, Evento.fecha, TipoAsistencia.descripcion)\
-            .join(Evento, Asistencia.id_evento == Evento.id_evento)\
-            .join(TipoAsistencia, Asistencia.id_tipo == TipoAsistencia.id_tipo)\
-            .filter(Asistencia.id_usuario == usuario.id_usuario)\
-            .all()
-        
-        # Crear un diccionario fecha -> estado
-        asist_dict = {fecha.isoformat(): estado for _, fecha, estado in asistencias}
-        
-        # Rellenar con "No convocado" si no hay registro para esa fecha
-        fila = {
-            'nombre': usuario.nombre,
-            'instrumento': usuario.instrumento,
-            **{fecha: asist_dict.get(fecha, 'No convocado') for fecha in fechas_list}
-        }
-        reporte.append(fila)
+    return jsonify(construir_reporte(get_agrupacion_id()))
 
-    return jsonify({
-        'fechas': fechas_list,
-        'registros': reporte
-    })
 
+# GET /api/asistencias/reporte-por-fecha/exportar?formato=xlsx|pdf&desde=&hasta=
+@asistencias_bp.route('/reporte-por-fecha/exportar', methods=['GET'])
+def exportar_reporte():
+    """Descarga el reporte como XLSX o PDF.
+
+    Si el archivo para la versión actual de los datos todavía no existe, se
+    genera en segundo plano y se responde 202; el cliente repite la misma
+    petición hasta recibir el archivo.
+    """
+    formato = request.args.get('formato', 'xlsx').lower()
+    if formato not in exportes.FORMATOS:
+        return jsonify({'error': f'Formato no soportado: {formato}'}), 400
+
+    try:
+        desde = request.args.get('desde')
+        hasta = request.args.get('hasta')
+        desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else None
+        hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, use el formato AAAA-MM-DD'}), 400
+
+    ruta, estado = exportes.solicitar_exportacion(
+        current_app._get_current_object(), get_agrupacion_id(), formato, desde, hasta
+    )
+    if ruta is None:
+        codigo = 500 if estado['estado'] == 'error' else 202
+        return jsonify(estado), codigo
+
+    return send_file(ruta, as_attachment=True, download_name=f'reporte-asistencias.{formato}')
+
+
+# GET /api/asistencias/exportar-historial?formato=parquet|arrow[&archivadas=0]
+@asistencias_bp.route('/exportar-historial', methods=['GET'])
+def exportar_historial():
+    """Historial completo de asistencias (incluidas las temporadas archivadas) en formato columnar."""
+    formato = request.args.get('formato', 'parquet').lower()
+    incluir_archivadas = request.args.get('archivadas', '1') not in ('0', 'false')
+    if formato not in columnar.FORMATOS:
+        return jsonify({'error': f'Formato no soportado: {formato}'}), 400
+
+    mimetype, extension = columnar.FORMATOS[formato]
+    id_agrupacion = get_agrupacion_id()
+    archivo = tempfile.TemporaryFile()
+    try:
+        columnar.escribir_historial(archivo, formato, id_agrupacion,
+                                    incluir_archivadas=incluir_archivadas)
+    except Exception as e:
+        archivo.close()
+        return jsonify({'error': f'Error al exportar el historial: {str(e)}'}), 500
+    archivo.seek(0)
+    return send_file(archivo, mimetype=mimetype, as_attachment=True,
+                     download_name=f'historial-asistencias.{extension}')
 
 # DELETE all asistencias
 @asistencias_bp.route('/delete-all', methods=['DELETE'])
 def delete_all_asistencias():
+    id_agrupacion = get_agrupacion_id()
     try:
-        num_deleted = db.session.query(Asistencia).delete()
+        num_deleted = db.session.query(Asistencia)\
+            .filter(Asistencia.id_agrupacion == id_agrupacion)\
+            .delete()
         db.session.commit()
         return jsonify({
             'message': f'Se eliminaron {num_deleted} registros de asistencia',
@@ -141,9 +329,11 @@ def delete_all_asistencias():
 # DELETE asistencias by user
 @asistencias_bp.route('/delete-by-user/<int:id_usuario>', methods=['DELETE'])
 def delete_asistencias_by_user(id_usuario):
+    id_agrupacion = get_agrupacion_id()
     try:
         num_deleted = db.session.query(Asistencia)\
             .filter(Asistencia.id_usuario == id_usuario)\
+            .filter(Asistencia.id_agrupacion == id_agrupacion)\
             .delete()
         db.session.commit()
         return jsonify({
@@ -157,11 +347,7 @@ def delete_asistencias_by_user(id_usuario):
 # GET /api/asistencias/tipos - Get valid attendance types
 @asistencias_bp.route('/tipos', methods=['GET'])
 def get_tipos_asistencia():
-    tipos = TipoAsistencia.query.all()
-    return jsonify([{
-        'id_tipo': t.id_tipo,
-        'descripcion': t.descripcion
-    } for t in tipos])
+    return jsonify(lecturas.serializar_tipos(db.session.execute(lecturas.consulta_tipos())))
 
 # POST /api/asistencias/import (CSV bulk upload)
 @asistencias_bp.route('/import', methods=['POST'])
@@ -216,19 +402,22 @@ def import_asistencias():
     if not rows:
         return jsonify({'creados': 0, 'errores': ['El archivo está vacío']}), 200
 
+    id_agrupacion = get_agrupacion_id()
+
     # 1. Caches
-    usuarios_map = {u.nombre: u.id_usuario for u in Usuario.query.with_entities(Usuario.nombre, Usuario.id_usuario).all()}
+    usuarios_map = {
+        u.nombre: u.id_usuario
+        for u in Usuario.query.with_entities(Usuario.nombre, Usuario.id_usuario).filter_by(id_agrupacion=id_agrupacion).all()
+    }
     
     # Create both exact and case-insensitive maps for tipos
     tipos_list = TipoAsistencia.query.with_entities(TipoAsistencia.descripcion, TipoAsistencia.id_tipo).all()
     tipos_map = {t.descripcion: t.id_tipo for t in tipos_list}
     tipos_map_lower = {t.descripcion.lower().strip(): t.id_tipo for t in tipos_list}
     
-    eventos_map = {e.fecha.isoformat(): e.id_evento for e in Evento.query.with_entities(Evento.fecha, Evento.id_evento).all()}
-    
-    # 2. Identify and create new events
-    fechas_procesadas = set()
-    nuevos_eventos = []
+    # 2. Get or create the events for every date in the file.
+    # Atomic (ON CONFLICT DO NOTHING), so concurrent imports never duplicate an event.
+    fechas_archivo = set()
     
     for row in rows:
         fecha_str = row.get('fecha', '').strip()
@@ -236,34 +425,33 @@ def import_asistencias():
             continue
             
         # Parse date
-        fecha_obj = None
         try:
-            fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            fecha_archivo = datetime.strptime(fecha_str, '%Y-%m-%d').date()
         except ValueError:
             try:
-                fecha_obj = datetime.strptime(fecha_str, '%d/%m/%Y').date()
+                fecha_archivo = datetime.strptime(fecha_str, '%d/%m/%Y').date()
             except ValueError:
                 continue
-        
-        if fecha_obj:
-            fecha_iso = fecha_obj.isoformat()
-            if fecha_iso not in eventos_map and fecha_iso not in fechas_procesadas:
-                nuevos_eventos.append(Evento(fecha=fecha_obj))
-                fechas_procesadas.add(fecha_iso)
+        fechas_archivo.add(fecha_archivo)
     
-    if nuevos_eventos:
+    # Las fechas de temporadas archivadas no crean eventos; esas filas se rechazan
+    fechas_archivadas = set()
+    try:
         try:
-            db.session.add_all(nuevos_eventos)
-            db.session.commit()
-            # Refresh map
-            eventos_map = {e.fecha.isoformat(): e.id_evento for e in Evento.query.with_entities(Evento.fecha, Evento.id_evento).all()}
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': 'Error al crear eventos nuevos', 'details': str(e)}), 500
+            eventos, _ = obtener_o_crear_eventos(id_agrupacion, fechas_archivo)
+        except FechasArchivadas as e:
+            fechas_archivadas = e.fechas
+            eventos, _ = obtener_o_crear_eventos(id_agrupacion, fechas_archivo - fechas_archivadas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Error al crear eventos nuevos', 'details': str(e)}), 500
+    eventos_map = {fecha.isoformat(): id_evento for fecha, id_evento in eventos.items()}
 
     # 3. Create Asistencias
     creados = 0
-    errores = []
+    validacion = ReporteValidacion(reader.fieldnames)
+    estados_validos = ', '.join(f'"{e}"' for e in sorted(tipos_map.keys()))
     nuevas_asistencias = []
     batch_keys = set()
     
@@ -273,7 +461,7 @@ def import_asistencias():
         estado_desc = row.get('estado', '').strip()
         
         if not fecha_str or not nombre_usuario or not estado_desc:
-            errores.append(f'Línea {idx}: datos incompletos - Fecha: "{fecha_str}", Usuario: "{nombre_usuario}", Estado: "{estado_desc}"')
+            validacion.rechazar('datos_incompletos', idx, f'Línea {idx}: datos incompletos - Fecha: "{fecha_str}", Usuario: "{nombre_usuario}", Estado: "{estado_desc}"', row)
             continue
             
         # Parse date
@@ -284,35 +472,27 @@ def import_asistencias():
             try:
                 fecha_obj = datetime.strptime(fecha_str, '%d/%m/%Y').date()
             except ValueError:
-                errores.append(f'Línea {idx}: fecha inválida "{fecha_str}" (Usuario: {nombre_usuario}, Estado: {estado_desc})')
+                validacion.rechazar('fecha_invalida', idx, f'Línea {idx}: fecha inválida "{fecha_str}" (Usuario: {nombre_usuario}, Estado: {estado_desc})', row)
                 continue
         
+        if fecha_obj in fechas_archivadas:
+            validacion.rechazar('temporada_archivada', idx, f'Línea {idx}: la fecha {fecha_str} pertenece a una temporada archivada - Usuario: {nombre_usuario}', row)
+            continue
+
         fecha_iso = fecha_obj.isoformat()
         
         id_evento = eventos_map.get(fecha_iso)
         if not id_evento:
-             errores.append(f'Línea {idx}: evento no encontrado (error interno) - Fecha: {fecha_str}, Usuario: {nombre_usuario}')
+             validacion.rechazar('evento_no_encontrado', idx, f'Línea {idx}: evento no encontrado (error interno) - Fecha: {fecha_str}, Usuario: {nombre_usuario}', row)
              continue
              
         id_usuario = usuarios_map.get(nombre_usuario)
         if not id_usuario:
-            errores.append(f'Línea {idx}: usuario "{nombre_usuario}" no encontrado - Fecha: {fecha_str}, Estado: {estado_desc}')
+            validacion.rechazar('usuario_no_encontrado', idx, f'Línea {idx}: usuario "{nombre_usuario}" no encontrado - Fecha: {fecha_str}, Estado: {estado_desc}', row)
             continue
         
-        # Map common variations to database values
-        estado_mappings = {
-            'falta': 'No asistió',
-            'permiso': 'Con permiso',
-            'asistió': 'Asistió',
-            'asistio': 'Asistió',
-            'no convocado': 'No convocado',
-            'no asistió': 'No asistió',
-            'no asistio': 'No asistió',
-            'con permiso': 'Con permiso'
-        }
-        
         # Normalize the estado_desc
-        estado_normalized = estado_mappings.get(estado_desc.lower().strip(), estado_desc)
+        estado_normalized = ESTADO_MAPPINGS.get(estado_desc.lower().strip(), estado_desc)
             
         # Try exact match first, then case-insensitive
         id_tipo = tipos_map.get(estado_normalized)
@@ -320,13 +500,12 @@ def import_asistencias():
             id_tipo = tipos_map_lower.get(estado_normalized.lower().strip())
         
         if not id_tipo:
-            estados_validos = ', '.join(f'"{e}"' for e in sorted(tipos_map.keys()))
-            errores.append(f'Línea {idx}: estado "{estado_desc}" no válido - Usuario: {nombre_usuario}, Fecha: {fecha_str}. Estados válidos: {estados_validos}')
+            validacion.rechazar('estado_invalido', idx, f'Línea {idx}: estado "{estado_desc}" no válido - Usuario: {nombre_usuario}, Fecha: {fecha_str}. Estados válidos: {estados_validos}', row)
             continue
             
         key = (id_usuario, id_evento)
         if key in batch_keys:
-            errores.append(f'Línea {idx}: registro duplicado - Usuario: {nombre_usuario}, Fecha: {fecha_str}')
+            validacion.rechazar('duplicado_en_archivo', idx, f'Línea {idx}: registro duplicado - Usuario: {nombre_usuario}, Fecha: {fecha_str}', row)
             continue
             
         batch_keys.add(key)
@@ -334,10 +513,12 @@ def import_asistencias():
         nuevas_asistencias.append(Asistencia(
             id_usuario=id_usuario,
             id_evento=id_evento,
-            id_tipo=id_tipo
+            id_tipo=id_tipo,
+            id_agrupacion=id_agrupacion
         ))
         creados += 1
     
+    todos_existian = False
     if nuevas_asistencias:
         try:
             # Fetch existing PKs for these events
@@ -359,11 +540,22 @@ def import_asistencias():
                 creados = len(final_list)
             else:
                 creados = 0
-                if not errores:
-                    errores.append("Todos los registros ya existían.")
+                todos_existian = not validacion.total
                     
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': 'Error al guardar asistencias', 'details': str(e)}), 500
 
-    return jsonify({'creados': creados, 'errores': errores}), 201
\ No newline at end of file
+    respuesta = validacion.respuesta(creados, 'asistencias', id_agrupacion)
+    if todos_existian:
+        respuesta['errores'] = ["Todos los registros ya existían."]
+    return jsonify(respuesta), 201
+
+
+# GET /api/asistencias/import/rechazos/<id> - CSV con las filas rechazadas de una importación
+@asistencias_bp.route('/import/rechazos/<id_rechazos>', methods=['GET'])
+def download_rechazos_asistencias(id_rechazos):
+    ruta = ruta_rechazos('asistencias', get_agrupacion_id(), id_rechazos)
+    if ruta is None:
+        return jsonify({'error': 'Archivo de rechazos no encontrado'}), 404
+    return send_file(ruta, mimetype='text/csv', as_attachment=True, download_name='asistencias-rechazadas.csv')
\ No newline at end of file
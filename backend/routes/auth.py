@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request, get_jwt
 from extensions import db, bcrypt
-from models import Admin
+from models import Admin, Agrupacion
+from tenancy import AGRUPACION_POR_DEFECTO
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -32,7 +33,8 @@ def login():
             identity=str(admin.id_admin),
             additional_claims={
                 'username': admin.username,
-                'nombre_completo': admin.nombre_completo
+                'nombre_completo': admin.nombre_completo,
+                'id_agrupacion': admin.id_agrupacion
             },
             expires_delta=timedelta(hours=8)
         )
@@ -40,7 +42,8 @@ def login():
         return jsonify({
             'access_token': access_token,
             'username': admin.username,
-            'nombre_completo': admin.nombre_completo
+            'nombre_completo': admin.nombre_completo,
+            'id_agrupacion': admin.id_agrupacion
         }), 200
     except Exception as e:
         print(f"Error creating token: {e}")
@@ -81,11 +84,43 @@ def register():
     if existing_admin:
         return jsonify({'error': 'El usuario ya existe'}), 400
     
+    # Agrupación del nuevo admin: la indicada por nombre o, si no se indica, la
+    # del token de quien hace la petición (o la por defecto con AGRUPACION_UNICA)
+    verify_jwt_in_request(optional=True)
+    id_agrupacion_token = get_jwt().get('id_agrupacion')
+    nombre_agrupacion = (data.get('agrupacion') or '').strip()
+    if nombre_agrupacion:
+        agrupacion = Agrupacion.query.filter_by(nombre=nombre_agrupacion).first()
+    elif id_agrupacion_token is not None:
+        agrupacion = db.session.get(Agrupacion, id_agrupacion_token)
+    elif current_app.config.get('AGRUPACION_UNICA'):
+        agrupacion = db.session.get(Agrupacion, AGRUPACION_POR_DEFECTO)
+    else:
+        return jsonify({'error': 'Indique el nombre de la agrupación'}), 400
+
+    if agrupacion is None:
+        if not nombre_agrupacion:
+            return jsonify({'error': 'Agrupación no encontrada'}), 404
+        # Agrupación nueva: quien la registra pasa a ser su primer admin
+        agrupacion = Agrupacion(nombre=nombre_agrupacion)
+        db.session.add(agrupacion)
+        db.session.flush()
+    elif id_agrupacion_token != agrupacion.id_agrupacion:
+        # Agrupación existente: solo un admin de esa agrupación puede sumar otro,
+        # salvo en el setup inicial, cuando todavía no tiene ninguno
+        tiene_admins = db.session.query(
+            Admin.query.filter_by(id_agrupacion=agrupacion.id_agrupacion).exists()
+        ).scalar()
+        if tiene_admins:
+            return jsonify({'error': 'Solo un administrador de la agrupación puede registrar otro'}), 403
+    id_agrupacion = agrupacion.id_agrupacion
+    
     # Cifrar contraseña
     password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
     
     # Crear nuevo admin
     new_admin = Admin(
+        id_agrupacion=id_agrupacion,
         username=username,
         password_hash=password_hash,
         nombre_completo=nombre_completo
@@ -96,7 +131,8 @@ def register():
         db.session.commit()
         return jsonify({
             'message': 'Administrador creado exitosamente',
-            'username': new_admin.username
+            'username': new_admin.username,
+            'id_agrupacion': new_admin.id_agrupacion
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, current_app, send_from_directory, abort
+from flask_jwt_extended import jwt_required
+from profiling import listar_perfiles, leer_metadatos
+from tenancy import get_agrupacion_id
+import os
+import re
+
+debug_bp = Blueprint('debug', __name__)
+
+_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def _ruta_perfil(id):
+    """Directorio del perfil `id`; 404 si no existe o es de otra agrupación."""
+    directorio = current_app.config['PROFILES_DIR']
+    if not _ID_VALIDO.match(id):
+        abort(404)
+    datos = leer_metadatos(directorio, id)
+    if datos is None or datos.get('id_agrupacion') != get_agrupacion_id():
+        abort(404)
+    return directorio
+
+
+# GET /api/debug/profiles
+@debug_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+def get_profiles():
+    return jsonify(listar_perfiles(current_app.config['PROFILES_DIR'], get_agrupacion_id()))
+
+
+# GET /api/debug/profiles/<id> - Descarga el volcado del perfilador (.prof o .html)
+@debug_bp.route('/profiles/<id>', methods=['GET'])
+@jwt_required()
+def download_profile(id):
+    directorio = _ruta_perfil(id)
+    for extension in ('.prof', '.html'):
+        if os.path.exists(os.path.join(directorio, id + extension)):
+            return send_from_directory(directorio, id + extension, as_attachment=True)
+    abort(404)
+
+
+# GET /api/debug/profiles/<id>/consultas - Log de consultas SQL del perfil
+@debug_bp.route('/profiles/<id>/consultas', methods=['GET'])
+@jwt_required()
+def download_profile_queries(id):
+    directorio = _ruta_perfil(id)
+    return send_from_directory(directorio, id + '.json', as_attachment=True)
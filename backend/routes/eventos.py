@@ -1,36 +1,164 @@
 from flask import Blueprint, request, jsonify
-from models import Evento
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Evento, Asistencia, Temporada
 from extensions import db
+from tenancy import get_agrupacion_id
+import lecturas
 from datetime import datetime
 
 eventos_bp = Blueprint('eventos', __name__)
 
+_ERROR_FECHA_ARCHIVADA = 'La fecha pertenece a una temporada archivada; restáurela antes de agregar eventos'
+
+_INSERTS_CON_CONFLICTO = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class FechasArchivadas(ValueError):
+    """Se intentó crear eventos en fechas de una temporada archivada."""
+
+    def __init__(self, fechas):
+        self.fechas = set(fechas)
+        super().__init__('Fechas dentro de una temporada archivada: '
+                         + ', '.join(f.isoformat() for f in sorted(self.fechas)))
+
+
+def fechas_archivadas(id_agrupacion, fechas):
+    """Las `fechas` que caen dentro de alguna temporada archivada de la agrupación."""
+    rangos = db.session.execute(
+        select(Temporada.fecha_inicio, Temporada.fecha_fin)
+        .where(Temporada.id_agrupacion == id_agrupacion, Temporada.archivada.is_(True))
+    ).tuples().all()
+    return {fecha for fecha in fechas if any(inicio <= fecha <= fin for inicio, fin in rangos)}
+
+
+def obtener_o_crear_eventos(id_agrupacion, fechas):
+    """Devuelve ({fecha: id_evento}, fechas_creadas) para las fechas dadas, creando las que falten.
+
+    Usa INSERT ... ON CONFLICT DO NOTHING ... RETURNING sobre el índice único
+    (id_agrupacion, fecha), así que dos peticiones concurrentes nunca crean el
+    mismo evento dos veces y no hace falta reintentar. No hace commit.
+
+    Lanza FechasArchivadas si alguna fecha cae en una temporada archivada: un
+    evento actual en esas fechas impediría restaurarla.
+    """
+    fechas = set(fechas)
+    if not fechas:
+        return {}, set()
+
+    archivadas = fechas_archivadas(id_agrupacion, fechas)
+    if archivadas:
+        raise FechasArchivadas(archivadas)
+
+    insert_con_conflicto = _INSERTS_CON_CONFLICTO.get(db.session.get_bind().dialect.name)
+    if insert_con_conflicto is not None:
+        stmt = insert_con_conflicto(Evento)\
+            .values([{'id_agrupacion': id_agrupacion, 'fecha': fecha} for fecha in fechas])\
+            .on_conflict_do_nothing(index_elements=['id_agrupacion', 'fecha'])\
+            .returning(Evento.fecha, Evento.id_evento)
+        eventos = dict(db.session.execute(stmt).tuples().all())
+        creadas = set(eventos)
+    else:
+        # Otros motores: sin ON CONFLICT, el índice único sigue evitando duplicados
+        existentes = db.session.execute(
+            select(Evento.fecha, Evento.id_evento)
+            .where(Evento.id_agrupacion == id_agrupacion, Evento.fecha.in_(fechas))
+        ).tuples().all()
+        eventos = dict(existentes)
+        creadas = fechas - set(eventos)
+        nuevos = [Evento(id_agrupacion=id_agrupacion, fecha=fecha) for fecha in creadas]
+        db.session.add_all(nuevos)
+        db.session.flush()
+        eventos.update({e.fecha: e.id_evento for e in nuevos})
+
+    # Las que ya existían (o las creó otra petición al mismo tiempo)
+    faltantes = fechas - set(eventos)
+    if faltantes:
+        eventos.update(db.session.execute(
+            select(Evento.fecha, Evento.id_evento)
+            .where(Evento.id_agrupacion == id_agrupacion, Evento.fecha.in_(faltantes))
+        ).tuples().all())
+
+    return eventos, creadas
+
+
+def unificar_eventos_duplicados(conn):
+    """Deja un solo evento por (id_agrupacion, fecha), el de menor id_evento.
+
+    Las asistencias de los duplicados pasan al evento que queda; si el usuario
+    ya tenía asistencia en ese evento se conserva esa y se descarta la otra.
+    Hace falta antes de crear el índice único uq_evento_agrupacion_fecha.
+    Devuelve las agrupaciones afectadas. No hace commit.
+    """
+    grupos = conn.execute(
+        select(Evento.id_agrupacion, Evento.fecha, func.min(Evento.id_evento))
+        .group_by(Evento.id_agrupacion, Evento.fecha)
+        .having(func.count() > 1)
+    ).tuples().all()
+
+    for id_agrupacion, fecha, id_evento in grupos:
+        duplicados = conn.execute(
+            select(Evento.id_evento)
+            .where(Evento.id_agrupacion == id_agrupacion, Evento.fecha == fecha,
+                   Evento.id_evento != id_evento)
+            .order_by(Evento.id_evento)
+        ).scalars().all()
+        for duplicado in duplicados:
+            conn.execute(
+                delete(Asistencia).where(
+                    Asistencia.id_evento == duplicado,
+                    Asistencia.id_usuario.in_(
+                        select(Asistencia.id_usuario).where(Asistencia.id_evento == id_evento)
+                    )
+                )
+            )
+            conn.execute(
+                update(Asistencia)
+                .where(Asistencia.id_evento == duplicado)
+                .values(id_evento=id_evento)
+            )
+        conn.execute(delete(Evento).where(Evento.id_evento.in_(duplicados)))
+
+    return {id_agrupacion for id_agrupacion, _, _ in grupos}
+
+
 @eventos_bp.route('', methods=['GET'])
 def get_eventos():
-    eventos = Evento.query.all()
-    return jsonify([{
-        'id_evento': e.id_evento,
-        'fecha': e.fecha.isoformat()
-    } for e in eventos])
+    filas = db.session.execute(lecturas.consulta_eventos(get_agrupacion_id()))
+    return jsonify(lecturas.serializar_eventos(filas))
 
 @eventos_bp.route('', methods=['POST'])
 def create_evento():
     data = request.get_json()
     fecha = datetime.fromisoformat(data['fecha']).date()
-    nuevo = Evento(fecha=fecha)
-    db.session.add(nuevo)
+    # Si ya hay un evento en esa fecha se devuelve el existente
+    try:
+        eventos, creadas = obtener_o_crear_eventos(get_agrupacion_id(), [fecha])
+    except FechasArchivadas:
+        return jsonify({'error': _ERROR_FECHA_ARCHIVADA}), 409
     db.session.commit()
     return jsonify({
-        'id_evento': nuevo.id_evento,
-        'fecha': nuevo.fecha.isoformat()
-    }), 201
+        'id_evento': eventos[fecha],
+        'fecha': fecha.isoformat()
+    }), 201 if creadas else 200
 
 @eventos_bp.route('/<int:id>', methods=['PUT'])
 def update_evento(id):
-    evento = Evento.query.get_or_404(id)
+    evento = Evento.query.filter_by(id_evento=id, id_agrupacion=get_agrupacion_id()).first_or_404()
     data = request.get_json()
-    evento.fecha = datetime.fromisoformat(data['fecha']).date()
-    db.session.commit()
+    fecha = datetime.fromisoformat(data['fecha']).date()
+    if fechas_archivadas(evento.id_agrupacion, [fecha]):
+        return jsonify({'error': _ERROR_FECHA_ARCHIVADA}), 409
+    evento.fecha = fecha
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Ya existe un evento en esa fecha'}), 400
     return jsonify({
         'id_evento': evento.id_evento,
         'fecha': evento.fecha.isoformat()
@@ -38,7 +166,7 @@ def update_evento(id):
 
 @eventos_bp.route('/<int:id>', methods=['DELETE'])
 def delete_evento(id):
-    evento = Evento.query.get_or_404(id)
+    evento = Evento.query.filter_by(id_evento=id, id_agrupacion=get_agrupacion_id()).first_or_404()
     db.session.delete(evento)
     db.session.commit()
-    return '', 204
\ No newline at end of file
+    return '', 204
@@ -0,0 +1,221 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.exc import IntegrityError
+from models import Temporada, Evento, Asistencia, EventoArchivo, AsistenciaArchivo
+from extensions import db
+from tenancy import get_agrupacion_id
+from reportes import construir_reporte
+import lecturas
+from datetime import datetime, date
+
+temporadas_bp = Blueprint('temporadas', __name__)
+
+
+def _temporada_dict(t):
+    return {
+        'id_temporada': t.id_temporada,
+        'nombre': t.nombre,
+        'fecha_inicio': t.fecha_inicio.isoformat(),
+        'fecha_fin': t.fecha_fin.isoformat(),
+        'archivada': t.archivada
+    }
+
+
+def _get_temporada_or_404(id):
+    return Temporada.query.filter_by(id_temporada=id, id_agrupacion=get_agrupacion_id()).first_or_404()
+
+
+# GET /api/temporadas
+@temporadas_bp.route('', methods=['GET'])
+def get_temporadas():
+    temporadas = Temporada.query.filter_by(id_agrupacion=get_agrupacion_id())\
+        .order_by(Temporada.fecha_inicio)\
+        .all()
+    return jsonify([_temporada_dict(t) for t in temporadas])
+
+
+# POST /api/temporadas
+@temporadas_bp.route('', methods=['POST'])
+def create_temporada():
+    data = request.get_json()
+    id_agrupacion = get_agrupacion_id()
+
+    try:
+        fecha_inicio = datetime.fromisoformat(data['fecha_inicio']).date()
+        fecha_fin = datetime.fromisoformat(data['fecha_fin']).date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Fechas inválidas'}), 400
+
+    if fecha_fin < fecha_inicio:
+        return jsonify({'error': 'La fecha de fin es anterior a la de inicio'}), 400
+
+    if Temporada.query.filter_by(id_agrupacion=id_agrupacion, nombre=data['nombre']).first():
+        return jsonify({'error': 'Ya existe una temporada con ese nombre'}), 400
+
+    # Las temporadas no se superponen: cada fecha se archiva y restaura con una sola
+    superpuesta = Temporada.query.filter(
+        Temporada.id_agrupacion == id_agrupacion,
+        Temporada.fecha_inicio <= fecha_fin,
+        Temporada.fecha_fin >= fecha_inicio
+    ).first()
+    if superpuesta:
+        return jsonify({'error': f'Las fechas se superponen con la temporada "{superpuesta.nombre}"'}), 400
+
+    nueva = Temporada(
+        id_agrupacion=id_agrupacion,
+        nombre=data['nombre'],
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin
+    )
+    try:
+        db.session.add(nueva)
+        db.session.commit()
+        return jsonify(_temporada_dict(nueva)), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Error al crear la temporada'}), 500
+
+
+# POST /api/temporadas/<id>/archivar
+@temporadas_bp.route('/<int:id>/archivar', methods=['POST'])
+def archivar_temporada(id):
+    """Mueve los eventos y asistencias de una temporada cerrada a las tablas de archivo.
+
+    Todo se hace con INSERT ... SELECT y DELETE en bloque dentro de una sola
+    transacción, sin cargar las filas en Python.
+    """
+    temporada = _get_temporada_or_404(id)
+
+    if temporada.archivada:
+        return jsonify({'error': 'La temporada ya está archivada'}), 400
+    if temporada.fecha_fin >= date.today():
+        return jsonify({'error': 'Solo se pueden archivar temporadas cerradas'}), 400
+
+    eventos_ids = select(Evento.id_evento).where(
+        Evento.id_agrupacion == temporada.id_agrupacion,
+        Evento.fecha.between(temporada.fecha_inicio, temporada.fecha_fin)
+    )
+
+    try:
+        db.session.execute(insert(EventoArchivo).from_select(
+            ['id_evento', 'id_agrupacion', 'fecha', 'id_temporada'],
+            select(Evento.id_evento, Evento.id_agrupacion, Evento.fecha, literal(temporada.id_temporada))
+            .where(Evento.id_evento.in_(eventos_ids))
+        ))
+        num_asistencias = db.session.execute(insert(AsistenciaArchivo).from_select(
+            ['id_usuario', 'id_evento', 'id_tipo', 'id_agrupacion', 'id_temporada'],
+            select(Asistencia.id_usuario, Asistencia.id_evento, Asistencia.id_tipo,
+                   Asistencia.id_agrupacion, literal(temporada.id_temporada))
+            .where(Asistencia.id_evento.in_(eventos_ids))
+        )).rowcount
+        db.session.execute(
+            delete(Asistencia).where(Asistencia.id_evento.in_(eventos_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        num_eventos = db.session.execute(
+            delete(Evento).where(Evento.id_evento.in_(eventos_ids)),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+
+        temporada.archivada = True
+        db.session.commit()
+        return jsonify({
+            'message': f'Temporada "{temporada.nombre}" archivada',
+            'eventos': num_eventos,
+            'asistencias': num_asistencias
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al archivar la temporada: {str(e)}'}), 500
+
+
+# POST /api/temporadas/<id>/restaurar
+@temporadas_bp.route('/<int:id>/restaurar', methods=['POST'])
+def restaurar_temporada(id):
+    """Devuelve los eventos y asistencias archivados de una temporada a las tablas actuales."""
+    temporada = _get_temporada_or_404(id)
+
+    if not temporada.archivada:
+        return jsonify({'error': 'La temporada no está archivada'}), 400
+
+    try:
+        num_eventos = db.session.execute(insert(Evento).from_select(
+            ['id_evento', 'id_agrupacion', 'fecha'],
+            select(EventoArchivo.id_evento, EventoArchivo.id_agrupacion, EventoArchivo.fecha)
+            .where(EventoArchivo.id_temporada == temporada.id_temporada)
+        )).rowcount
+        num_asistencias = db.session.execute(insert(Asistencia).from_select(
+            ['id_usuario', 'id_evento', 'id_tipo', 'id_agrupacion'],
+            select(AsistenciaArchivo.id_usuario, AsistenciaArchivo.id_evento,
+                   AsistenciaArchivo.id_tipo, AsistenciaArchivo.id_agrupacion)
+            .where(AsistenciaArchivo.id_temporada == temporada.id_temporada)
+        )).rowcount
+        db.session.execute(
+            delete(AsistenciaArchivo).where(AsistenciaArchivo.id_temporada == temporada.id_temporada),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            delete(EventoArchivo).where(EventoArchivo.id_temporada == temporada.id_temporada),
+            execution_options={'synchronize_session': False}
+        )
+
+        temporada.archivada = False
+        db.session.commit()
+        return jsonify({
+            'message': f'Temporada "{temporada.nombre}" restaurada',
+            'eventos': num_eventos,
+            'asistencias': num_asistencias
+        }), 200
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': _conflicto_restauracion(temporada)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al restaurar la temporada: {str(e)}'}), 500
+
+
+def _conflicto_restauracion(temporada):
+    """Explica por qué los eventos archivados no entran en las tablas actuales."""
+    archivados = select(EventoArchivo).where(EventoArchivo.id_temporada == temporada.id_temporada).subquery()
+    misma_fecha = db.session.execute(select(
+        select(Evento.id_evento).join(archivados, (Evento.id_agrupacion == archivados.c.id_agrupacion)
+                                      & (Evento.fecha == archivados.c.fecha)).exists()
+    )).scalar()
+    if misma_fecha:
+        return 'Ya existen eventos actuales en fechas de la temporada archivada'
+    mismo_id = db.session.execute(select(
+        select(Evento.id_evento).join(archivados, Evento.id_evento == archivados.c.id_evento).exists()
+    )).scalar()
+    if mismo_id:
+        return 'Hay eventos actuales con los mismos ids que los archivados; no se puede restaurar la temporada'
+    return 'La temporada archivada choca con datos actuales'
+
+
+# GET /api/temporadas/<id>/asistencias (solo lectura, desde el archivo)
+@temporadas_bp.route('/<int:id>/asistencias', methods=['GET'])
+def get_asistencias_archivadas(id):
+    temporada = _get_temporada_or_404(id)
+
+    filas = db.session.execute(lecturas.consulta_asistencias(
+        temporada.id_agrupacion,
+        evento_model=EventoArchivo,
+        asistencia_model=AsistenciaArchivo,
+        filtros=(AsistenciaArchivo.id_temporada == temporada.id_temporada,)
+    ))
+    return jsonify(lecturas.serializar_asistencias(filas))
+
+
+# GET /api/temporadas/<id>/reporte-por-fecha (solo lectura, desde el archivo)
+@temporadas_bp.route('/<int:id>/reporte-por-fecha', methods=['GET'])
+def reporte_temporada_archivada(id):
+    temporada = _get_temporada_or_404(id)
+
+    if not temporada.archivada:
+        return jsonify({'error': 'La temporada no está archivada'}), 400
+
+    return jsonify(construir_reporte(
+        temporada.id_agrupacion,
+        evento_model=EventoArchivo,
+        asistencia_model=AsistenciaArchivo,
+        filtros=(EventoArchivo.id_temporada == temporada.id_temporada,)
+    ))
@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify
-from models import Usuario, Asistencia
+from flask import Blueprint, request, jsonify, send_file
+from models import Usuario, Asistencia, AsistenciaArchivo
 from extensions import db
+from tenancy import get_agrupacion_id
+import lecturas
+from importacion import ReporteValidacion, ruta_rechazos
 import csv
 
 usuarios_bp = Blueprint('usuarios', __name__)
@@ -8,13 +11,11 @@ usuarios_bp = Blueprint('usuarios', __name__)
 # GET /api/usuarios
 @usuarios_bp.route('', methods=['GET'])
 def get_usuarios():
+    # Fuera del try: sin token debe responder 401, no 500
+    id_agrupacion = get_agrupacion_id()
     try:
-        usuarios = Usuario.query.all()
-        return jsonify([{
-            'id_usuario': u.id_usuario,
-            'nombre': u.nombre,
-            'instrumento': u.instrumento
-        } for u in usuarios])
+        filas = db.session.execute(lecturas.consulta_usuarios(id_agrupacion))
+        return jsonify(lecturas.serializar_usuarios(filas))
     except Exception as e:
         print(f"Error getting usuarios: {e}")
         return jsonify({'error': str(e)}), 500
@@ -23,13 +24,15 @@ def get_usuarios():
 @usuarios_bp.route('', methods=['POST'])
 def create_usuario():
     data = request.get_json()
+    id_agrupacion = get_agrupacion_id()
     
     # Verificar si el usuario ya existe
-    usuario_existente = Usuario.query.filter_by(nombre=data['nombre']).first()
+    usuario_existente = Usuario.query.filter_by(id_agrupacion=id_agrupacion, nombre=data['nombre']).first()
     if usuario_existente:
         return jsonify({'error': 'Ya existe un usuario con ese nombre'}), 400
     
     nuevo = Usuario(
+        id_agrupacion=id_agrupacion,
         nombre=data['nombre'],
         instrumento=data.get('instrumento')
     )
@@ -48,12 +51,12 @@ def create_usuario():
 # PUT /api/usuarios/<int:id>
 @usuarios_bp.route('/<int:id>', methods=['PUT'])
 def update_usuario(id):
-    usuario = Usuario.query.get_or_404(id)
+    usuario = Usuario.query.filter_by(id_usuario=id, id_agrupacion=get_agrupacion_id()).first_or_404()
     data = request.get_json()
     
     # Verificar si el nuevo nombre ya existe en otro usuario
     if data['nombre'] != usuario.nombre:
-        usuario_existente = Usuario.query.filter_by(nombre=data['nombre']).first()
+        usuario_existente = Usuario.query.filter_by(id_agrupacion=usuario.id_agrupacion, nombre=data['nombre']).first()
         if usuario_existente:
             return jsonify({'error': 'Ya existe un usuario con ese nombre'}), 400
     
@@ -73,11 +76,12 @@ def update_usuario(id):
 # DELETE /api/usuarios/<int:id>
 @usuarios_bp.route('/<int:id>', methods=['DELETE'])
 def delete_usuario(id):
-    usuario = Usuario.query.get_or_404(id)
+    usuario = Usuario.query.filter_by(id_usuario=id, id_agrupacion=get_agrupacion_id()).first_or_404()
     
     try:
         # Eliminar todas las asistencias asociadas a este usuario primero
         Asistencia.query.filter_by(id_usuario=id).delete()
+        AsistenciaArchivo.query.filter_by(id_usuario=id).delete()
         
         # Ahora sí eliminar al usuario
         db.session.delete(usuario)
@@ -135,28 +139,33 @@ def import_usuarios():
     if reader.fieldnames:
         reader.fieldnames = [h.strip().lower() for h in reader.fieldnames]
     
+    id_agrupacion = get_agrupacion_id()
+
     # Pre-fetch existing names
-    existing_names = set(u.nombre for u in Usuario.query.with_entities(Usuario.nombre).all())
+    existing_names = set(
+        u.nombre for u in Usuario.query.with_entities(Usuario.nombre).filter_by(id_agrupacion=id_agrupacion).all()
+    )
     
     creados = 0
-    errores = []
+    validacion = ReporteValidacion(reader.fieldnames)
     nuevos_usuarios = []
     
     for idx, row in enumerate(reader, start=2):
         nombre = row.get('nombre', '').strip()
         
         if not nombre:
-            errores.append(f'Línea {idx}: nombre vacío')
+            validacion.rechazar('nombre_vacio', idx, f'Línea {idx}: nombre vacío', row)
             continue
             
         # Check for duplicates
         if nombre in existing_names:
-            errores.append(f'Línea {idx}: usuario "{nombre}" ya existe')
+            validacion.rechazar('usuario_existente', idx, f'Línea {idx}: usuario "{nombre}" ya existe', row)
             continue
             
         instrumento = row.get('instrumento', '').strip() or None
         
         nuevo = Usuario(
+            id_agrupacion=id_agrupacion,
             nombre=nombre,
             instrumento=instrumento,
             email=row.get('email', '').strip() or None,
@@ -174,4 +183,13 @@ def import_usuarios():
             db.session.rollback()
             return jsonify({'error': 'Error al guardar usuarios', 'details': str(e)}), 500
             
-    return jsonify({'creados': creados, 'errores': errores}), 201
\ No newline at end of file
+    return jsonify(validacion.respuesta(creados, 'usuarios', id_agrupacion)), 201
+
+
+# GET /api/usuarios/import/rechazos/<id> - CSV con las filas rechazadas de una importación
+@usuarios_bp.route('/import/rechazos/<id_rechazos>', methods=['GET'])
+def download_rechazos_usuarios(id_rechazos):
+    ruta = ruta_rechazos('usuarios', get_agrupacion_id(), id_rechazos)
+    if ruta is None:
+        return jsonify({'error': 'Archivo de rechazos no encontrado'}), 404
+    return send_file(ruta, mimetype='text/csv', as_attachment=True, download_name='usuarios-rechazados.csv')
\ No newline at end of file
@@ -0,0 +1,25 @@
+# tenancy.py
+from flask import g, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended.exceptions import NoAuthorizationError
+
+# Agrupación a la que pertenecen los datos creados antes de la multi-agrupación
+AGRUPACION_POR_DEFECTO = 1
+
+def get_agrupacion_id():
+    """Devuelve la agrupación de la petición actual.
+
+    Se toma del claim 'id_agrupacion' del JWT. Sin token (o sin claim) la
+    petición se rechaza con 401, salvo que AGRUPACION_UNICA esté activado:
+    entonces se usa la agrupación por defecto, como antes de la multi-agrupación.
+    """
+    if 'id_agrupacion' not in g:
+        unica = current_app.config.get('AGRUPACION_UNICA', False)
+        verify_jwt_in_request(optional=unica)
+        id_agrupacion = get_jwt().get('id_agrupacion')
+        if id_agrupacion is None:
+            if not unica:
+                raise NoAuthorizationError('El token no indica la agrupación; vuelva a iniciar sesión')
+            id_agrupacion = AGRUPACION_POR_DEFECTO
+        g.id_agrupacion = id_agrupacion
+    return g.id_agrupacion
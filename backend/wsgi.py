@@ -0,0 +1,6 @@
+# wsgi.py
+# Punto de entrada para servidores WSGI de producción:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+from app import create_app
+
+app = create_app()
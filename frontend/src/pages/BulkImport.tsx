@@ -1,9 +1,12 @@
 import { useState } from 'react';
-import { importUsuarios, importAsistencias } from '../services/api';
+import { importUsuarios, importAsistencias, downloadRechazos } from '../services/api';
 
 interface ImportResult {
     creados?: number;
     errores?: string[];
+    total_errores?: number;
+    resumen_errores?: Record<string, { cantidad: number; ejemplos: string[] }>;
+    id_rechazos?: string | null;
     error?: string;
 }
 
@@ -69,6 +72,20 @@ export default function BulkImport() {
         }
     };
 
+    const handleDownloadRechazos = async (idRechazos: string) => {
+        try {
+            const blob = await downloadRechazos(activeTab === 'users' ? 'usuarios' : 'asistencias', idRechazos);
+            const url = URL.createObjectURL(blob);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `${activeTab === 'users' ? 'usuarios' : 'asistencias'}_rechazados.csv`;
+            link.click();
+            URL.revokeObjectURL(url);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     const downloadTemplate = (type: 'users' | 'attendances') => {
         const header = type === 'users'
             ? 'nombre,instrumento'
@@ -265,15 +282,35 @@ export default function BulkImport() {
                                         </div>
                                         <div className="bg-slate-50 p-4 rounded-xl border border-slate-100">
                                             <span className="block text-slate-500 text-xs uppercase tracking-wide font-semibold">Errores / Omitidos</span>
-                                            <span className={`text-3xl font-bold ${result.errores && result.errores.length > 0 ? 'text-amber-600' : 'text-slate-800'}`}>
-                                                {result.errores?.length || 0}
+                                            <span className={`text-3xl font-bold ${(result.total_errores ?? result.errores?.length ?? 0) > 0 ? 'text-amber-600' : 'text-slate-800'}`}>
+                                                {result.total_errores ?? result.errores?.length ?? 0}
                                             </span>
                                         </div>
                                     </div>
 
+                                    {result.resumen_errores && Object.keys(result.resumen_errores).length > 0 && (
+                                        <div className="mt-4 flex flex-wrap items-center gap-2">
+                                            {Object.entries(result.resumen_errores).map(([codigo, { cantidad }]) => (
+                                                <span key={codigo} className="px-2 py-1 rounded-md bg-amber-50 border border-amber-200 text-xs text-amber-700">
+                                                    {codigo.replace(/_/g, ' ')}: {cantidad}
+                                                </span>
+                                            ))}
+                                            {result.id_rechazos && (
+                                                <button
+                                                    onClick={() => handleDownloadRechazos(result.id_rechazos!)}
+                                                    className="ml-auto px-3 py-1 rounded-md bg-slate-800 text-white text-xs font-semibold hover:bg-slate-700"
+                                                >
+                                                    Descargar filas rechazadas
+                                                </button>
+                                            )}
+                                        </div>
+                                    )}
+
                                     {result.errores && result.errores.length > 0 && (
                                         <div className="mt-4">
-                                            <h4 className="text-sm font-semibold text-slate-700 mb-2">Detalle de errores:</h4>
+                                            <h4 className="text-sm font-semibold text-slate-700 mb-2">
+                                                {result.total_errores && result.total_errores > result.errores.length ? 'Ejemplos de errores:' : 'Detalle de errores:'}
+                                            </h4>
                                             <div className="bg-slate-50 rounded-lg border border-slate-200 p-3 max-h-60 overflow-y-auto text-xs font-mono text-slate-600">
                                                 {result.errores.map((err, idx) => (
                                                     <div key={idx} className="py-1 border-b border-slate-100 last:border-0">
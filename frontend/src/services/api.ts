@@ -129,6 +129,14 @@ export const importUsuarios = async (file: File) => {
     return response.data;
 };
 
+// Descargar el CSV de filas rechazadas de una importación
+export const downloadRechazos = async (tipo: 'usuarios' | 'asistencias', idRechazos: string) => {
+    const response = await api.get(`/${tipo}/import/rechazos/${idRechazos}`, {
+        responseType: 'blob',
+    });
+    return response.data;
+};
+
 // Importar asistencias (CSV)
 export const importAsistencias = async (file: File) => {
     const formData = new FormData();